@@ -0,0 +1,79 @@
+import math
+from collections import namedtuple
+
+AlarmRule = namedtuple("AlarmRule", ["abbreviation", "name", "field", "op", "threshold", "clear", "absolute"],
+                       defaults=(None, False))
+
+DEFAULT_RULES = (
+    AlarmRule("ПС", "Потеря связи", "gui_time", "stale", 2.0),
+    AlarmRule("НЗ", "Низкий заряд", "fuel_level", "below", 20, clear=25),
+    AlarmRule("ОД", "Ошибка двигателя", "engine_rpm", "below", 300, clear=400),
+    AlarmRule("ОДТ", "Ошибка датчика", "airspeed_time", "stale", 3.0),
+    AlarmRule("ПО", "Потеря ориентации", "phi_rad", "above", math.radians(60), clear=math.radians(50), absolute=True),
+    AlarmRule("ОС", "Ошибка стабилизации", "theta_rad", "above", math.radians(30), clear=math.radians(25), absolute=True),
+    AlarmRule("ПГ", "Перегрев", "t_eng", "above", 850, clear=800),
+    AlarmRule("СВ", "Сильная вибрация", "vibration", "above", 1.0, clear=0.8),
+    AlarmRule("GPS", "Нет сигнала GPS", "gps_fix", "below", 0.5),
+    AlarmRule("ОВ", "Ошибка высоты", "agl_m", "below", -1.0, clear=0.0),
+)
+
+
+class AlarmEngine:
+    def __init__(self, rules=DEFAULT_RULES):
+        self.rules = tuple(rules)
+        self.abbreviations = tuple(rule.abbreviation for rule in self.rules)
+        self.mask = 0
+        self.changed = True
+        self.last_values = {}
+        self.rules_by_field = {}
+        self.stale_rules = []
+        for bit, rule in enumerate(self.rules):
+            if rule.op == "stale":
+                self.stale_rules.append((bit, rule))
+            elif rule.op in ("above", "below"):
+                self.rules_by_field.setdefault(rule.field, []).append((bit, rule))
+            else:
+                raise ValueError(f"unknown alarm op {rule.op!r} in rule {rule.abbreviation}")
+        # Staleness alarms are on until the first sample proves otherwise.
+        for bit, _ in self.stale_rules:
+            self.mask |= 1 << bit
+
+    def active(self):
+        return [rule for bit, rule in enumerate(self.rules) if self.mask >> bit & 1]
+
+    def update(self, fields, now):
+        mask = self.mask
+        last_values = self.last_values
+        for field, rules in self.rules_by_field.items():
+            value = fields.get(field)
+            if field in last_values and last_values[field] == value:
+                continue
+            last_values[field] = value
+            for bit, rule in rules:
+                mask = self.evaluate(rule, bit, value, mask)
+
+        for bit, rule in self.stale_rules:
+            timestamp = fields.get(rule.field)
+            if timestamp is None or now - timestamp > rule.threshold:
+                mask |= 1 << bit
+            else:
+                mask &= ~(1 << bit)
+
+        self.changed = mask != self.mask
+        self.mask = mask
+        return mask
+
+    @staticmethod
+    def evaluate(rule, bit, value, mask):
+        flag = 1 << bit
+        if value is None:
+            return mask & ~flag
+        if rule.absolute:
+            value = abs(value)
+        clear = rule.threshold if rule.clear is None else rule.clear
+        active = mask & flag
+        if rule.op == "above":
+            active = value > clear if active else value > rule.threshold
+        else:
+            active = value < clear if active else value < rule.threshold
+        return mask | flag if active else mask & ~flag
@@ -0,0 +1,184 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+from alarms import AlarmEngine
+from filters import DEFAULT_FILTERS, filter_config, filter_log, filter_spec
+
+PANEL_SIZE = (1200, 700)
+
+worker_state = {}
+
+
+def init_worker(recording, filtered):
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    # SDL turns SIGTERM into a QUIT event by default, which would keep Pool.terminate() waiting.
+    os.environ["SDL_NO_SIGNAL_HANDLERS"] = "1"
+    import pygame
+    import bpla
+    from replay import ReplaySource
+
+    surface = pygame.Surface(PANEL_SIZE)
+    worker_state["pygame"] = pygame
+    worker_state["bpla"] = bpla
+    worker_state["source"] = ReplaySource(recording)
+    worker_state["surface"] = surface
+    worker_state["panel"] = bpla.PanelRenderer(surface)
+    worker_state["filtered"] = filtered
+
+
+def render_range(task):
+    first, last, start_time, frame_interval, out_dir, image_format = task
+    pygame = worker_state["pygame"]
+    bpla = worker_state["bpla"]
+    source = worker_state["source"]
+    surface = worker_state["surface"]
+    panel = worker_state["panel"]
+    filtered = worker_state["filtered"]
+    # Ranges render independently, so hysteresis state starts fresh at the first frame of each.
+    alarms = AlarmEngine()
+
+    started = time.perf_counter()
+    raw_file = None
+    if image_format == "raw":
+        raw_file = open(os.path.join(out_dir, f"chunk_{first:08d}.rgb"), "wb")
+    for frame in range(first, last):
+        timestamp = start_time + frame * frame_interval
+        snapshot = source.snapshot_at(timestamp)
+        if filtered:
+            index = source.index_at(timestamp)
+            snapshot = snapshot._replace(**{channel: float(values[index]) for channel, values in filtered.items()})
+        alarms.update(bpla.alarm_fields(snapshot), timestamp)
+        # Recordings are stamped with wall-clock time, so the clock shows when the frame was flown.
+        bpla.draw_panel(panel, snapshot, alarms, clock_time=timestamp)
+        if raw_file is not None:
+            raw_file.write(pygame.image.tobytes(surface, "RGB"))
+        else:
+            pygame.image.save(surface, os.path.join(out_dir, f"frame_{frame:08d}.png"))
+    if raw_file is not None:
+        raw_file.close()
+    return first, last - first, time.perf_counter() - started
+
+
+def split_ranges(frames, chunks):
+    bounds = [frames * i // chunks for i in range(chunks + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(chunks) if bounds[i] < bounds[i + 1]]
+
+
+def merge_raw(out_dir, chunk_starts):
+    with open(os.path.join(out_dir, "frames.rgb"), "wb") as merged:
+        for first in sorted(chunk_starts):
+            chunk_path = os.path.join(out_dir, f"chunk_{first:08d}.rgb")
+            with open(chunk_path, "rb") as chunk:
+                while True:
+                    data = chunk.read(1 << 20)
+                    if not data:
+                        break
+                    merged.write(data)
+            os.remove(chunk_path)
+
+
+def render_reference(recording, filtered, task):
+    # The first frames again in a single worker process, into a scratch directory, as the baseline
+    # the speed-up is measured against.
+    first, last, start_time, frame_interval, _, image_format = task
+    with tempfile.TemporaryDirectory() as scratch:
+        with mp.get_context("spawn").Pool(1, initializer=init_worker, initargs=(recording, filtered)) as pool:
+            _, count, seconds = pool.apply(render_range, ((first, last, start_time, frame_interval, scratch,
+                                                          image_format),))
+    return count, seconds
+
+
+def batch_render(recording, out_dir, fps=30.0, workers=None, image_format="png", start=None, end=None,
+                 chunks_per_worker=4, filters=DEFAULT_FILTERS, reference_frames=60):
+    from recorder import FlightLog
+
+    log = FlightLog(recording)
+    if not len(log):
+        raise ValueError(f"{recording} has no recorded samples")
+    start_time = float(log["time"][0]) if start is None else start
+    end_time = float(log["time"][-1]) if end is None else end
+    # Filtered once over the whole log, the same way the panel filtered the samples as they arrived,
+    # and handed to every worker rather than recomputed in each.
+    filtered = filter_log(log, filters) if filters else {}
+    del log
+    frame_interval = 1.0 / fps
+    frames = int((end_time - start_time) / frame_interval) + 1
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Several ranges per worker so a slow range near the end doesn't leave other cores idle.
+    ranges = split_ranges(frames, workers * chunks_per_worker)
+    tasks = [(first, last, start_time, frame_interval, out_dir, image_format) for first, last in ranges]
+    started = time.perf_counter()
+    pool = mp.get_context("spawn").Pool(workers, initializer=init_worker, initargs=(recording, filtered))
+    try:
+        results = pool.map(render_range, tasks, chunksize=1)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    if image_format == "raw":
+        merge_raw(out_dir, [first for first, _, _ in results])
+    wall = time.perf_counter() - started
+
+    busy = sum(seconds for _, _, seconds in results)
+    reference_count = reference_seconds = 0
+    if reference_frames:
+        reference_count, reference_seconds = render_reference(
+            recording, filtered, (0, min(frames, reference_frames), start_time, frame_interval, None, image_format))
+    reference_rate = reference_count / reference_seconds if reference_seconds else 0.0
+    report = {
+        "frames": frames,
+        "fps": fps,
+        "workers": workers,
+        "format": image_format,
+        "width": PANEL_SIZE[0],
+        "height": PANEL_SIZE[1],
+        "wall_seconds": wall,
+        "frames_per_second": frames / wall if wall else 0.0,
+        "worker_busy_seconds": busy,
+        # Measured against the same frames rendered by one process; the batch wall time includes
+        # starting the pool, which the reference doesn't, so this is what a run actually gains.
+        "reference_frames": reference_count,
+        "reference_frames_per_second": reference_rate,
+        "speedup": frames / wall / reference_rate if wall and reference_rate else None,
+    }
+    with open(os.path.join(out_dir, "frames.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Render a recorded flight to an image sequence")
+    parser.add_argument("recording")
+    parser.add_argument("out_dir")
+    parser.add_argument("--fps", type=float, default=30.0, help="frames per second of flight time")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to CPU count")
+    parser.add_argument("--format", choices=["png", "raw"], default="png",
+                        help="numbered PNG files or one raw RGB24 file")
+    parser.add_argument("--start", type=float, default=None, help="first timestamp to render")
+    parser.add_argument("--end", type=float, default=None, help="last timestamp to render")
+    parser.add_argument("--filter", action="append", default=[], type=filter_spec,
+                        metavar="CHANNEL=KIND[:NAME=VALUE,...]",
+                        help="filter a telemetry channel as the panel's --filter does, repeatable")
+    parser.add_argument("--no-filter", action="store_true", help="render raw climb rate and attitude")
+    parser.add_argument("--reference-frames", type=int, default=60,
+                        help="frames to render in a single process for the speed-up figure, 0 to skip")
+    args = parser.parse_args()
+
+    report = batch_render(args.recording, args.out_dir, fps=args.fps, workers=args.workers,
+                          image_format=args.format, start=args.start, end=args.end,
+                          filters={} if args.no_filter else filter_config(args.filter),
+                          reference_frames=args.reference_frames)
+    print(f"rendered {report['frames']} frames in {report['wall_seconds']:.2f} s "
+          f"({report['frames_per_second']:.1f} frames/s) with {report['workers']} workers")
+    if report["speedup"] is not None:
+        print(f"single process {report['reference_frames_per_second']:.1f} frames/s over "
+              f"{report['reference_frames']} frames, speed-up {report['speedup']:.2f}x")
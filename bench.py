@@ -0,0 +1,181 @@
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import bpla
+from alarms import AlarmEngine, DEFAULT_RULES
+from profiler import percentile
+from telemetry import EMPTY_SNAPSHOT
+
+
+def synthetic_snapshot(i, frames):
+    phase = 2 * math.pi * i / frames
+    return EMPTY_SNAPSHOT._replace(
+        lat_deg=54.524580 + 0.01 * math.sin(phase),
+        lon_deg=39.701148 + 0.01 * math.cos(phase),
+        alt_m=1000 + 1000 * math.sin(phase),
+        agl_m=900 + 900 * math.sin(phase),
+        phi_rad=math.radians(30) * math.sin(3 * phase),
+        theta_rad=math.radians(15) * math.sin(2 * phase),
+        psi_rad=phase,
+        climb_rate=60 * math.cos(phase),
+        airspeed=150 + 150 * math.sin(phase),
+        gui_time=i / 30,
+        airspeed_time=i / 30,
+    )
+
+
+alarm_abbreviations = tuple(rule.abbreviation for rule in DEFAULT_RULES)
+
+
+def synthetic_alarm_mask(i):
+    return sum(1 << n for n in range(10) if (i // 30 + n) % 7 == 0)
+
+
+def widget_calls(surface, snapshot, i):
+    return {
+        "top_sensors": lambda: bpla.draw_top_sensors(surface, alarm_abbreviations, synthetic_alarm_mask(i),
+                                                      50, 18, 1100, 34),
+        "attitude": lambda: bpla.draw_attitude_indicator(surface, snapshot.phi_rad, snapshot.theta_rad, 450, 100, 300),
+        "heading": lambda: bpla.draw_heading_indicator(surface, snapshot.psi_rad, 500, 450, 200),
+        "speed": lambda: bpla.draw_speed_indicator(surface, snapshot.airspeed, 150, 155, 200),
+        "vsi": lambda: bpla.draw_vsi_indicator(surface, snapshot.climb_rate / 3.281, 750, 400, 200),
+        "altimeter": lambda: bpla.draw_altimeter(surface, snapshot.alt_m, 250, 400, 200),
+        "fuel": lambda: bpla.draw_fuel_indicator(surface, 100 - i % 100, 800, 180, 100, 60),
+        "clock": lambda: bpla.draw_clock(surface, time.strftime("%H:%M:%S"), 800, 100, 100, 60),
+        "rpm": lambda: bpla.draw_rpm_indicator(surface, 2000 + i % 500, 800, 260, 100, 60),
+        "temperature": lambda: bpla.draw_temperature(surface, 19 + i % 5, 940, 100, 100, 60),
+        "temp_engine": lambda: bpla.draw_temp_engine(surface, 690 + i % 20, 940, 180, 100, 60),
+        "oil": lambda: bpla.draw_oil(surface, 9, 940, 260, 100, 60),
+    }
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": percentile(ordered, 0.5) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "samples": len(ordered),
+    }
+
+
+def run_benchmark(frames, warmup):
+    surface = bpla.open_display((1200, 700))
+    timings = {}
+    for i in range(-warmup, frames):
+        snapshot = synthetic_snapshot(i, frames)
+        for name, call in widget_calls(surface, snapshot, i).items():
+            started = time.perf_counter()
+            call()
+            elapsed = time.perf_counter() - started
+            if i >= 0:
+                timings.setdefault(name, []).append(elapsed)
+
+    panel = bpla.PanelRenderer(surface)
+    alarms = AlarmEngine()
+    frame_times = []
+    for i in range(-warmup, frames):
+        snapshot = synthetic_snapshot(i, frames)
+        started = time.perf_counter()
+        alarms.update(bpla.alarm_fields(snapshot), snapshot.gui_time)
+        bpla.draw_panel(panel, snapshot, alarms)
+        panel.end_frame()
+        elapsed = time.perf_counter() - started
+        if i >= 0:
+            frame_times.append(elapsed)
+
+    return {
+        "meta": {
+            "frames": frames,
+            "warmup": warmup,
+            "video_driver": os.environ.get("SDL_VIDEODRIVER"),
+            "python": sys.version.split()[0],
+            "pygame": bpla.pygame.version.ver,
+        },
+        "widgets": {name: summarize(samples) for name, samples in timings.items()},
+        "frame": summarize(frame_times),
+    }
+
+
+def measure_startup(runs):
+    # Each run is a fresh interpreter, so this is a cold start up to the first frame on screen.
+    import subprocess
+    import tempfile
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bpla.py")
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = os.path.join(tmp, "startup.json")
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, script, "--exit-after-first-frame", "--no-map",
+                            "--startup-report", report_path], check=True, stdout=subprocess.DEVNULL)
+            timings.setdefault("process", []).append(time.perf_counter() - started)
+            with open(report_path) as f:
+                for name, value in json.load(f).items():
+                    timings.setdefault(name.removesuffix("_ms"), []).append(value / 1000)
+    return {name: summarize(samples) for name, samples in timings.items()}
+
+
+def benchmark_entries(results):
+    entries = [(name, stats) for name, stats in results["widgets"].items()] + [("frame", results["frame"])]
+    entries += [(f"startup:{name}", stats) for name, stats in results.get("startup", {}).items()]
+    return entries
+
+
+def compare(results, baseline, threshold_pct, metric):
+    regressions = []
+    base_entries = dict(benchmark_entries(baseline))
+    for name, stats in benchmark_entries(results):
+        base = base_entries.get(name)
+        if base is None:
+            continue
+        change = (stats[metric] - base[metric]) / base[metric] * 100 if base[metric] else 0.0
+        if change > threshold_pct:
+            regressions.append((name, base[metric], stats[metric], change))
+    return regressions
+
+
+def print_results(results):
+    print(f"{'widget':<22}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, stats in benchmark_entries(results):
+        print(f"{name:<22}{stats['mean_ms']:>10.3f}{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Headless frame-time benchmark for the instruments panel")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=30)
+    parser.add_argument("--out", default="bench_results.json", help="where to save the results as JSON")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="fail when a widget gets slower than the baseline by this many percent")
+    parser.add_argument("--metric", choices=["mean_ms", "p50_ms", "p99_ms"], default="p50_ms")
+    parser.add_argument("--startup-runs", type=int, default=5,
+                        help="cold starts to time up to the first frame, 0 to skip")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.frames, args.warmup)
+    if args.startup_runs:
+        results["startup"] = measure_startup(args.startup_runs)
+    print_results(results)
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.metric)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {before:.3f} -> {after:.3f} ms ({change:+.1f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions over {args.threshold}% ({args.metric})")
@@ -1,16 +1,23 @@
+import time
+
+IMPORT_STARTED = time.perf_counter()
+
 import pygame
 import math
+import argparse
 import datetime
-import folium
-from folium.features import CustomIcon
+import json
+from collections import OrderedDict
 from pygame.locals import *
-from flightgear_python.fg_if import TelnetConnection
-from flightgear_python.fg_if import GuiConnection
-
-pygame.init()
-screen = pygame.display.set_mode((1200, 700))
-pygame.display.set_caption("Helicopter Instruments Panel")
-clock = pygame.time.Clock()
+from fonts import render_text, text_cache
+from gauge_geometry import tick_table, scale_angles, rotate_points, needle_polygon
+from telemetry import EMPTY_SNAPSHOT, TelemetryFeed
+from alarms import AlarmEngine
+from profiler import Profiler
+from pacing import SnapshotInterpolator, FramePacer
+from filters import FilterStage, filter_config, filter_spec
+from layout import PanelLayout, get_default_layout
+from navigation import LiveNavigation
 
 COLORS = {
     "background": (100, 100, 100),
@@ -21,10 +28,12 @@ COLORS = {
     "sky": (0, 21, 140),
     "ground": (139, 69, 19),
     "red": (255, 0, 0),
-    "yellow": (255, 255, 0)
+    "yellow": (255, 255, 0),
+    "map_background": (40, 40, 40),
+    "map_track": (0, 90, 255),
 }
 
-def gui_callback(gui_data, event_pipe):
+def gui_values(gui_data):
     lat_deg = math.degrees(gui_data['lat_rad'])
     lon_deg = math.degrees(gui_data['lon_rad'])
     alt_m = gui_data['alt_m']
@@ -33,352 +42,399 @@ def gui_callback(gui_data, event_pipe):
     theta_rad = gui_data['theta_rad']
     psi_rad = gui_data['psi_rad']
     climb_rate = gui_data['climb_rate_ft_per_s']
-    child_data = (lat_deg, lon_deg, alt_m, agl_m, phi_rad, theta_rad, psi_rad, climb_rate)
-    event_pipe.child_send(child_data)
-
-def draw_top_sensors(surface, sensor_data):
-    sensor_width = 100
-    sensor_height = 30
-    spacing = 10
-    total_width = 10 * sensor_width + 9 * spacing
-    start_x = (1200 - total_width) // 2
-    start_y = 20
-    font_size = 16
-    font = pygame.font.Font(None, font_size)
+    return lat_deg, lon_deg, alt_m, agl_m, phi_rad, theta_rad, psi_rad, climb_rate
+
+
+def gui_callback(gui_data, event_pipe):
+    event_pipe.child_send(gui_values(gui_data))
+
+
+def gui_ring_callback(ring_name, gui_data, event_pipe):
+    # Runs in GuiConnection's receive process: one record written into shared memory, no pickling
+    # and no syscall per packet.
+    from shm_ring import attached_ring
+    attached_ring(ring_name).write(time.monotonic(), gui_values(gui_data))
+
+SENSOR_STRIP_CACHE_SIZE = 16
+sensor_strips = OrderedDict()
+
+
+def scaled(value, scale):
+    return max(1, round(value * scale))
+
+
+def build_sensor_strip(abbreviations, mask, width, height):
+    # Laid out for a 1100x34 rect, boxes stretch with the rect and text with its smaller side.
+    scale_x = width / 1100
+    scale_y = height / 34
+    scale = min(scale_x, scale_y)
+    sensor_width = round(100 * scale_x)
+    sensor_height = round(30 * scale_y)
+    spacing = round(10 * scale_x)
+    line_width = scaled(2, scale)
+    strip = pygame.Surface((10 * sensor_width + 9 * spacing + 2, sensor_height + 2), pygame.SRCALPHA)
     for i in range(10):
-        x = start_x + i * (sensor_width + spacing)
-        if i < len(sensor_data):
-            sensor = sensor_data[i]
-            color = COLORS["sensor_ok"] if not sensor["value"] else COLORS["sensor_bad"]
-            abbreviation = sensor["abbreviation"]
+        x = i * (sensor_width + spacing)
+        color = COLORS["sensor_bad"] if mask >> i & 1 else COLORS["sensor_ok"]
+        abbreviation = abbreviations[i] if i < len(abbreviations) else ""
+
+        pygame.draw.rect(strip, color, (x, 0, sensor_width, sensor_height))
+        pygame.draw.line(strip, COLORS["white"], (x, 0), (x + sensor_width, 0), line_width)
+        pygame.draw.line(strip, COLORS["white"], (x, 0), (x, sensor_height), line_width)
+        pygame.draw.line(strip, COLORS["black"], (x + sensor_width, 0), (x + sensor_width, sensor_height),
+                         line_width)
+        pygame.draw.line(strip, COLORS["black"], (x, sensor_height), (x + sensor_width, sensor_height), line_width)
+
+        text_surface = render_text(abbreviation, scaled(16, scale), COLORS["white"])
+        text_rect = text_surface.get_rect(center=(x + sensor_width // 2, sensor_height // 2))
+        strip.blit(text_surface, text_rect)
+    return strip
+
+
+def draw_top_sensors(surface, abbreviations, mask, x, y, width, height):
+    # The strip only changes with the alarm bitmask, so each combination is drawn once.
+    key = (tuple(abbreviations), mask, width, height, tuple(COLORS.values()))
+    strip = sensor_strips.get(key)
+    if strip is None:
+        strip = sensor_strips[key] = build_sensor_strip(abbreviations, mask, width, height)
+        if len(sensor_strips) > SENSOR_STRIP_CACHE_SIZE:
+            sensor_strips.popitem(last=False)
+    else:
+        sensor_strips.move_to_end(key)
+    surface.blit(strip, (x + (width - (strip.get_width() - 2)) // 2, y + round(2 * height / 34)))
+
+
+ATTITUDE_ROLL_RESOLUTION = 0.5
+ATTITUDE_MAX_FRAMES = 64
+
+
+class AttitudeIndicator:
+    max_pitch_deg = 90
+
+    def __init__(self, size, roll_resolution=ATTITUDE_ROLL_RESOLUTION, max_frames=ATTITUDE_MAX_FRAMES):
+        self.size = size
+        self.radius = size // 2
+        # Drawn for a 300 px gauge, every offset below is scaled from that.
+        self.scale = size / 300
+        self.border_width = scaled(15, self.scale)
+        self.pitch_scale = 2.0 * self.scale
+        self.roll_resolution = roll_resolution
+        self.max_frames = max_frames
+        self.max_offset = int(self.max_pitch_deg * self.pitch_scale)
+        self.frames = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self.horizon = self.build_horizon()
+        self.roll_scale = self.build_roll_scale()
+        self.overlay = self.build_overlay()
+        self.work = pygame.Surface((size, size))
+
+    def build_horizon(self):
+        # Tall sky/ground strip with the pitch ladder baked in; pitch only selects which
+        # window of it is visible.
+        size = self.size
+        radius = self.radius
+        scale = self.scale
+        height = size + 2 * self.max_offset
+        horizon_y = self.max_offset + radius
+        horizon = pygame.Surface((size, height))
+        pygame.draw.rect(horizon, COLORS["sky"], (0, 0, size, horizon_y))
+        pygame.draw.rect(horizon, COLORS["ground"], (0, horizon_y, size, height - horizon_y))
+
+        pitch_marker_lengths = {
+            5: 10,
+            10: 15,
+            20: 20
+        }
+
+        for pitch_angle in range(-20, 21, 5):
+            if pitch_angle == 0:
+                continue
+
+            if abs(pitch_angle) == 20:
+                length = pitch_marker_lengths[20]
+            elif abs(pitch_angle) % 10 == 0:
+                length = pitch_marker_lengths[10]
+            else:
+                length = pitch_marker_lengths[5]
+
+            length *= scale
+            y_pos = horizon_y + pitch_angle * 2.5 * scale
+            pygame.draw.line(horizon, COLORS["white"],
+                             (radius - length, y_pos), (radius + length, y_pos), scaled(2, scale))
+
+            if abs(pitch_angle) % 10 == 0:
+                text = render_text(f"{abs(pitch_angle)}", scaled(24, scale), COLORS["white"])
+                text_rect = text.get_rect(center=(radius - length - 15 * scale, y_pos))
+                horizon.blit(text, text_rect)
+                text_rect = text.get_rect(center=(radius + length + 15 * scale, y_pos))
+                horizon.blit(text, text_rect)
+        return horizon
+
+    def build_roll_scale(self):
+        marks = tuple(range(-180, 180, 10))
+        scale = self.scale
+        table = tick_table(self.radius, self.border_width, marks,
+                           tuple((15 if angle % 30 == 0 else 8) * scale for angle in marks),
+                           self.border_width + 25 * scale)
+        roll_scale = pygame.Surface((self.size, self.size), pygame.SRCALPHA)
+        draw_ticks(roll_scale, table, width=scaled(2, scale))
+        draw_tick_labels(roll_scale, [str(abs(angle)) if angle % 30 == 0 else "" for angle in marks],
+                         table.labels.tolist(), font_size=scaled(24, scale))
+        return roll_scale
+
+    def build_overlay(self):
+        size = self.size
+        radius = self.radius
+        overlay = pygame.Surface((size, size), pygame.SRCALPHA)
+        overlay.fill(COLORS["background"])
+        pygame.draw.circle(overlay, (0, 0, 0, 0), (radius, radius), radius)
+
+        pygame.draw.circle(overlay, COLORS["red"], (radius, radius), scaled(6, self.scale))
+
+        strip_length = scaled(40, self.scale)
+        strip_thickness = scaled(6, self.scale)
+        strip_offset = scaled(30, self.scale)
+
+        pygame.draw.rect(overlay, COLORS["yellow"],
+                         (radius - strip_offset - strip_length, radius - strip_thickness // 2,
+                          strip_length, strip_thickness))
+
+        pygame.draw.rect(overlay, COLORS["yellow"],
+                         (radius + strip_offset, radius - strip_thickness // 2,
+                          strip_length, strip_thickness))
+
+        pygame.draw.circle(overlay, COLORS["black"], (radius, radius), radius, self.border_width)
+        return overlay
+
+    def build_frame(self, roll_deg, pitch_offset, frame=None):
+        size = self.size
+        self.work.blit(self.horizon, (0, 0), (0, self.max_offset + pitch_offset, size, size))
+        self.work.blit(self.roll_scale, (0, 0))
+        rotated = pygame.transform.rotate(self.work, roll_deg)
+        if frame is None:
+            frame = pygame.Surface((size, size))
         else:
-            color = COLORS["sensor_ok"]
-            abbreviation = ""
+            frame.fill(COLORS["black"])
+        frame.blit(rotated, rotated.get_rect(center=(self.radius, self.radius)))
+        return frame
+
+    def get_frame(self, roll_deg, pitch_offset):
+        roll_step = round(roll_deg / self.roll_resolution)
+        key = (roll_step, pitch_offset)
+        frame = self.frames.get(key)
+        if frame is not None:
+            self.frames.move_to_end(key)
+            self.hits += 1
+            return frame
+
+        self.misses += 1
+        # Once the cache is full, the least recently used frame's surface is drawn over
+        # instead of allocating a new one.
+        recycled = None
+        if len(self.frames) >= self.max_frames:
+            _, recycled = self.frames.popitem(last=False)
+        frame = self.build_frame(roll_step * self.roll_resolution, pitch_offset, recycled)
+        self.frames[key] = frame
+        return frame
+
+    def draw(self, surface, roll_rad, pitch_rad, x, y):
+        roll_deg = -math.degrees(roll_rad)
+        pitch_offset = int(math.degrees(pitch_rad) * self.pitch_scale)
+        pitch_offset = max(-self.max_offset, min(self.max_offset, pitch_offset))
+
+        surface.blit(self.get_frame(roll_deg, pitch_offset), (x, y))
+        surface.blit(self.overlay, (x, y))
+
 
-        pygame.draw.rect(surface, color, (x, start_y, sen-sor_width, sensor_height))
-        pygame.draw.line(surface, COLORS["white"], (x, start_y), (x + sensor_width, start_y), 2)
-        pygame.draw.line(surface, COLORS["white"], (x, start_y), (x, start_y + sensor_height), 2)
-        pygame.draw.line(surface, COLORS["black"], (x + sen-sor_width, start_y),
-                         (x + sensor_width, start_y + sen-sor_height), 2)
-        pygame.draw.line(surface, COLORS["black"], (x, start_y + sensor_height),
-                         (x + sensor_width, start_y + sen-sor_height), 2)
+def draw_attitude_indicator(surface, roll_rad, pitch_rad, x, y, size):
+    get_gauge_face("attitude", size, AttitudeIndicator).draw(surface, roll_rad, pitch_rad, x, y)
 
 
-        text_surface = font.render(abbreviation, True, COL-ORS["white"])
-        text_rect = text_surface.get_rect(center=(x + sen-sor_width // 2, start_y + sensor_height // 2))
-        surface.blit(text_surface, text_rect)
+gauge_faces = {}
 
 
-def draw_attitude_indicator(surface, roll_rad, pitch_rad, x, y, size):
-    roll_deg = -math.degrees(roll_rad)
-    pitch_deg = math.degrees(pitch_rad)
+def get_gauge_face(kind, size, build_face):
+    colors = tuple(COLORS.values())
+    cached = gauge_faces.get((kind, size))
+    if cached is None or cached[0] != colors:
+        cached = (colors, build_face(size))
+        gauge_faces[(kind, size)] = cached
+    return cached[1]
+
+
+def draw_gauge_bezel(container, radius, border_width):
+    pygame.draw.circle(container, COLORS["white"], (radius, radius), radius, border_width)
+    pygame.draw.circle(container, COLORS["black"], (radius, radius), radius - border_width)
+
+
+def draw_ticks(container, table, mask=None, offset=(0, 0), width=2):
+    ox, oy = offset
+    for i, (start, end) in enumerate(zip(table.starts.tolist(), table.ends.tolist())):
+        if mask is None or mask[i]:
+            pygame.draw.line(container, COLORS["white"], (start[0] + ox, start[1] + oy),
+                             (end[0] + ox, end[1] + oy), width)
+
+
+def draw_tick_labels(container, labels, centers, offset=(0, 0), font_size=24):
+    ox, oy = offset
+    for text_str, center in zip(labels, centers):
+        if text_str:
+            text = render_text(text_str, font_size, COLORS["white"])
+            container.blit(text, text.get_rect(center=(center[0] + ox, center[1] + oy)))
+
+
+def draw_needle(surface, cx, cy, rad_angle, length, base=10):
+    pygame.draw.polygon(surface, COLORS["white"], needle_polygon(cx, cy, rad_angle, length, base))
+
+
+def build_heading_face(size):
     radius = size // 2
-    border_width = 15
+    container = pygame.Surface((size, size), pygame.SRCALPHA)
+    draw_gauge_bezel(container, radius, scaled(5, size / 200))
+    return container
+
 
+def build_heading_overlay(size):
+    radius = size // 2
+    scale = size / 200
     container = pygame.Surface((size, size), pygame.SRCALPHA)
 
-    inner_width = int(size * 1.5)
-    inner_height = int(size * 2)
-    inner = pygame.Surface((inner_width, inner_height), pygame.SRCALPHA)
-    pitch_offset = int(pitch_deg * 2.0)
-    sky_height = inner.get_height() // 2 - pitch_offset
-
-    pygame.draw.rect(inner, COLORS["sky"], (0, 0, inner_width, sky_height))
-    pygame.draw.rect(inner, COLORS["ground"], (0, sky_height, inner_width, inner_height - sky_height))
-
-    rotated_inner = pygame.transform.rotate(inner, roll_deg)
-    rot_rect = rotated_inner.get_rect(center=(radius, radius))
-    container.blit(rotated_inner, rot_rect.topleft)
-
-    for angle in range(-180, 180, 10):
-        rad_angle = math.radians(angle + roll_deg)
-        start_out = (radius + (radius - border_width) * math.cos(rad_angle),
-                     radius + (radius - border_width) * math.sin(rad_angle))
-
-        if angle % 30 == 0:
-
-            length = 15
-            end = (radius + (radius - border_width - length) * math.cos(rad_angle),
-                   radius + (radius - border_width - length) * math.sin(rad_angle))
-            pygame.draw.line(container, COLORS["white"], start_out, end, 2)
-
-            text = font.render(str(abs(angle)), True, COL-ORS["white"])
-            text_rect = text.get_rect(center=(
-                radius + (radius - border_width - length - 10) * math.cos(rad_angle),
-                radius + (radius - border_width - length - 10) * math.sin(rad_angle)
-            ))
-            container.blit(text, text_rect)
-        else:
-            length = 8
-            end = (radius + (radius - border_width - length) * math.cos(rad_angle),
-                   radius + (radius - border_width - length) * math.sin(rad_angle))
-            pygame.draw.line(container, COLORS["white"], start_out, end, 2)
-
-    pitch_marker_lengths = {
-        5: 10,
-        10: 15,
-        20: 20
-    }
-
-    for pitch_angle in range(-20, 21, 5):
-        if pitch_angle == 0:
-            continue
-
-        if abs(pitch_angle) == 20:
-            length = pitch_marker_lengths[20]
-        elif abs(pitch_angle) % 10 == 0:
-            length = pitch_marker_lengths[10]
-        else:
-            length = pitch_marker_lengths[5]
-
-        y_offset = pitch_angle * 2.5
-        y_pos = radius + y_offset - pitch_offset
-
-        if abs(pitch_angle) == 20:
-            pygame.draw.line(container, COLORS["white"],
-                             (radius - length, y_pos), (radius + length, y_pos), 2)
-            text = font.render(f"{abs(pitch_angle)}", True, COLORS["white"])
-            text_rect = text.get_rect(center=(radius - length - 15, y_pos))
-            container.blit(text, text_rect)
-            text_rect = text.get_rect(center=(radius + length + 15, y_pos))
-            container.blit(text, text_rect)
-        elif abs(pitch_angle) % 10 == 0:
-            pygame.draw.line(container, COLORS["white"],
-                             (radius - length, y_pos), (radius + length, y_pos), 2)
-            text = font.render(f"{abs(pitch_angle)}", True, COLORS["white"])
-            text_rect = text.get_rect(center=(radius - length - 15, y_pos))
-            container.blit(text, text_rect)
-            text_rect = text.get_rect(center=(radius + length + 15, y_pos))
-            container.blit(text, text_rect)
-        else:
-            pygame.draw.line(container, COLORS["white"],
-                             (radius - length, y_pos), (radius + length, y_pos), 2)
+    draw_needle(container, radius, radius, math.radians(-90), radius - 20 * scale, 10 * scale)
 
-    pygame.draw.circle(container, COLORS["red"], (radius, ra-dius), 6)
+    label_text = render_text("КУРС", scaled(24, scale), COLORS["yellow"])
+    label_rect = label_text.get_rect(topright=(size - 75 * scale, 120 * scale))
+    container.blit(label_text, label_rect)
+    return container
 
-    strip_length = 40
-    strip_thickness = 6
-    strip_offset = 30
 
-    pygame.draw.rect(container, COLORS["yellow"],
-                     (radius - strip_offset - strip_length, radius - strip_thickness // 2,
-                      strip_length, strip_thickness))
+HEADING_MARKS = tuple(range(0, 360, 10))
+HEADING_LABELS = tuple(
+    {0: "N", 90: "E", 180: "S", 270: "W"}.get(angle, str(angle // 10)) if angle % 30 == 0 else ""
+    for angle in HEADING_MARKS
+)
 
-    pygame.draw.rect(container, COLORS["yellow"],
-                     (radius + strip_offset, radius - strip_thickness // 2,
-                      strip_length, strip_thickness))
 
-    pygame.draw.circle(container, COLORS["black"], (radius, radius), radius, border_width)
-    pygame.draw.circle(container, COLORS["background"], (radi-us, radius), radius+64, border_width+50)
-    surface.blit(container, (x, y))
+def heading_card_table(radius, scale=1.0):
+    return tick_table(radius, scaled(5, scale), tuple(angle - 90 for angle in HEADING_MARKS),
+                      tuple((15 if angle % 30 == 0 else 8) * scale for angle in HEADING_MARKS), 30 * scale)
 
 
 def draw_heading_indicator(surface, heading_rad, x, y, size):
     radius = size // 2
-    border_width = 5
-    font = pygame.font.Font(None, 24)
+    scale = size / 200
+    table = heading_card_table(radius, scale)
+    line_width = scaled(2, scale)
+    count = len(HEADING_MARKS)
 
-    container = pygame.Surface((size, size), pygame.SRCALPHA)
+    surface.blit(get_gauge_face("heading", size, build_heading_face), (x, y))
 
-    pygame.draw.circle(container, COLORS["white"], (radius, radius), radius, border_width)
+    points = rotate_points(table.points, radius, -heading_rad).tolist()
+    starts = points[:count]
+    ends = points[count:2 * count]
+    for start, end in zip(starts, ends):
+        pygame.draw.line(surface, COLORS["white"], (start[0] + x, start[1] + y), (end[0] + x, end[1] + y),
+                         line_width)
+    draw_tick_labels(surface, HEADING_LABELS, points[2 * count:], (x, y), scaled(24, scale))
 
-    pygame.draw.circle(container, COLORS["black"], (radius, radius), radius - border_width)
+    surface.blit(get_gauge_face("heading_overlay", size, build_heading_overlay), (x, y))
 
-    heading_deg = math.degrees(heading_rad)
-    for angle in range(0, 360, 10):
-        draw_angle = angle - 90 - heading_deg
-        rad_angle = math.radians(draw_angle)
-
-        if angle % 30 == 0:
-            length = 15
-            if angle == 0:
-                text_str = "N"
-            elif angle == 90:
-                text_str = "E"
-            elif angle == 180:
-                text_str = "S"
-            elif angle == 270:
-                text_str = "W"
-            else:
-                text_str = str(angle // 10)
 
-            text = font.render(text_str, True, COL-ORS["white"])
-            text_rect = text.get_rect(
-                center=(radius + (radius - 30) * math.cos(rad_angle),
-                        radius + (radius - 30) * math.sin(rad_angle)))
-            container.blit(text, text_rect)
-        else:
-            length = 8
-
-        start = (radius + (radius - border_width) * math.cos(rad_angle),
-                 radius + (radius - border_width) * math.sin(rad_angle))
-        end = (radius + (radius - border_width - length) * math.cos(rad_angle),
-               radius + (radius - border_width - length) * math.sin(rad_angle))
-        pygame.draw.line(container, COLORS["white"], start, end, 2)
-
-    arrow_angle = math.radians(-90)
-    arrow_points = [
-        (radius + (radius - 20) * math.cos(arrow_angle),
-         radius + (radius - 20) * math.sin(arrow_angle)),
-        (radius + 10 * math.cos(arrow_angle + math.radians(150)),
-         radius + 10 * math.sin(arrow_angle + math.radians(150))),
-        (radius + 10 * math.cos(arrow_angle - math.radians(150)),
-         radius + 10 * math.sin(arrow_angle - math.radians(150)))
-    ]
-    pygame.draw.polygon(container, COLORS["white"], ar-row_points)
-
-    label_text = font.render("КУРС", True, COLORS["yellow"])
-    label_rect = label_text.get_rect(topright=(size -75, 120))
-    container.blit(label_text, label_rect)
+SPEED_MARKS = tuple(range(0, 301, 20))
 
-    surface.blit(container, (x, y))
 
-
-def draw_speed_indicator(surface, speed, x, y, size):
+def build_speed_face(size):
     radius = size // 2
-    border_width = 5
-    font = pygame.font.Font(None, 24)
-    small_font = pygame.font.Font(None, 20)
+    scale = size / 200
+    border_width = scaled(5, scale)
+    table = tick_table(radius, border_width, scale_angles(SPEED_MARKS, -90, -270, 300),
+                       tuple((15 if mark % 100 == 0 else 8) * scale for mark in SPEED_MARKS), 35 * scale)
 
     container = pygame.Surface((size, size), pygame.SRCALPHA)
+    draw_gauge_bezel(container, radius, border_width)
 
-    pygame.draw.circle(container, COLORS["white"], (radius, radius), radius, border_width)
+    label_text = render_text("узлы", scaled(20, scale), COLORS["yellow"])
+    label_rect = label_text.get_rect(topright=(size - 35 * scale, 35 * scale))
+    container.blit(label_text, label_rect)
 
-    pygame.draw.circle(container, COLORS["black"], (radius, radius), radius - border_width)
+    draw_ticks(container, table, width=scaled(2, scale))
+    draw_tick_labels(container, [str(mark) if mark % 100 == 0 else "" for mark in SPEED_MARKS],
+                     table.labels.tolist(), font_size=scaled(24, scale))
+    return container
 
-    label_text = small_font.render("узлы", True, COL-ORS["yellow"])
-    label_rect = label_text.get_rect(topright=(size - 35, 35))
-    container.blit(label_text, label_rect)
 
+def draw_speed_indicator(surface, speed, x, y, size):
+    radius = size // 2
+    scale = size / 200
     max_speed = 300
     start_angle = -90
     scale_range = 270
 
-    for speed_mark in range(0, 301, 20):
+    surface.blit(get_gauge_face("speed", size, build_speed_face), (x, y))
 
-        angle = start_angle - (speed_mark / max_speed) * scale_range
-        rad_angle = math.radians(angle)
+    arrow_angle = start_angle - (speed / max_speed) * scale_range
+    draw_needle(surface, x + radius, y + radius, math.radians(arrow_angle), radius - 25 * scale, 10 * scale)
 
-        if speed_mark % 100 == 0:
-            length = 15
-            text = font.render(str(speed_mark), True, COL-ORS["white"])
-            text_rect = text.get_rect(
-                center=(radius + (radius - 35) * math.cos(rad_angle),
-                        radius + (radius - 35) * math.sin(rad_angle)))
-            container.blit(text, text_rect)
-        else:
-            length = 8
-
-        start = (radius + (radius - border_width) * math.cos(rad_angle),
-                 radius + (radius - border_width) * math.sin(rad_angle))
-        end = (radius + (radius - border_width - length) * math.cos(rad_angle),
-               radius + (radius - border_width - length) * math.sin(rad_angle))
-        pygame.draw.line(container, COLORS["white"], start, end, 2)
-
-        arrow_angle = start_angle - (speed / max_speed) * scale_range
-        rad_angle = math.radians(arrow_angle)
-
-        arrow_length = radius - 25
-        arrow_points = [
-            (radius + arrow_length * math.cos(rad_angle),
-             radius + arrow_length * math.sin(rad_angle)),
-            radius + 10 * math.cos(rad_angle + math.radians(150)),
-             radius + 10 * math.sin(rad_angle + math.radians(150)),
-             radius + 10 * math.cos(rad_angle - math.radians(150)),
-              radius + 10 * math.sin(rad_angle - math.radians(150))
-             ]
-        pygame.draw.polygon(container, COLORS["white"], [
-             arrow_points[0],
-             (arrow_points[1], arrow_points[2]),
-            (arrow_points[3], arrow_points[4])
-        ])
-
-        text = font.render(f"{int(speed)}", True, COL-ORS["white"])
-        text_rect = text.get_rect(center=(radius + 48, radius - 35))
-        container.blit(text, text_rect)
-
-        surface.blit(container, (x, y))
+    text = render_text(f"{int(speed)}", scaled(24, scale), COLORS["white"])
+    text_rect = text.get_rect(center=(x + radius + 48 * scale, y + radius - 35 * scale))
+    surface.blit(text, text_rect)
 
 
-def draw_vsi_indicator(surface, vs, x, y, size):
-    radius = size // 2
-    border_width = 5
-    font = pygame.font.Font(None, 24)
-    small_font = pygame.font.Font(None, 16)
-    small_font1 = pygame.font.Font(None, 18)
-    max_vs = 20
+VSI_MARKS = tuple(range(-20, 21, 2))
 
-    container = pygame.Surface((size, size), pygame.SRCALPHA)
 
-    pygame.draw.circle(container, COLORS["white"], (radius, radius), radius, border_width)
+def build_vsi_face(size):
+    radius = size // 2
+    scale = size / 200
+    border_width = scaled(5, scale)
+    major = tick_table(radius, border_width, (-180, -90, 0, 90, 180), (15 * scale,) * 5, 30 * scale)
+    table = tick_table(radius, border_width, scale_angles(VSI_MARKS, -180, 180, 20),
+                       (8 * scale,) * len(VSI_MARKS), 30 * scale)
 
-    pygame.draw.circle(container, COLORS["black"], (radius, radius), radius - border_width)
+    container = pygame.Surface((size, size), pygame.SRCALPHA)
+    draw_gauge_bezel(container, radius, border_width)
 
-    label_text1 = small_font.render("ВЕРТИКАЛЬНАЯ СКОРОСТЬ", True, COLORS["yellow"])
-    label_rect1 = label_text1.get_rect(topright=(size - 20, 55))
+    label_text1 = render_text("ВЕРТИКАЛЬНАЯ СКОРОСТЬ", scaled(16, scale), COLORS["yellow"])
+    label_rect1 = label_text1.get_rect(topright=(size - 20 * scale, 55 * scale))
     container.blit(label_text1, label_rect1)
 
-    label_text2 = small_font.render("М/С", True, COL-ORS["white"])
-    label_rect2 = label_text2.get_rect(topright=(size -90, 70))
+    label_text2 = render_text("М/С", scaled(16, scale), COLORS["white"])
+    label_rect2 = label_text2.get_rect(topright=(size - 90 * scale, 70 * scale))
     container.blit(label_text2, label_rect2)
 
-    label_text3 = small_font1.render("вверх", True, COL-ORS["white"])
-    label_rect3 = label_text3.get_rect(topright=(size -130, 70))
+    label_text3 = render_text("вверх", scaled(18, scale), COLORS["white"])
+    label_rect3 = label_text3.get_rect(topright=(size - 130 * scale, 70 * scale))
     container.blit(label_text3, label_rect3)
 
-    label_text4 = small_font1.render("вниз", True, COL-ORS["white"])
-    label_rect4 = label_text4.get_rect(topright=(size -135, 120))
+    label_text4 = render_text("вниз", scaled(18, scale), COLORS["white"])
+    label_rect4 = label_text4.get_rect(topright=(size - 135 * scale, 120 * scale))
     container.blit(label_text4, label_rect4)
 
+    draw_ticks(container, major, width=scaled(2, scale))
+    draw_ticks(container, table, [mark % 10 != 0 for mark in VSI_MARKS], width=scaled(2, scale))
+    draw_tick_labels(container, [str(abs(mark)) if mark % 10 == 0 else "" for mark in VSI_MARKS],
+                     table.labels.tolist(), font_size=scaled(24, scale))
+    return container
+
+
+def draw_vsi_indicator(surface, vs, x, y, size):
+    radius = size // 2
+    scale = size / 200
+    max_vs = 20
     start_angle = -180
     scale_range = 180
 
-    for angle in range(-180, 181, 90):
-        rad_angle = math.radians(angle)
-        start = (radius + (radius - border_width) * math.cos(rad_angle),
-                 radius + (radius - border_width) * math.sin(rad_angle))
-        end = (radius + (radius - border_width - 15) * math.cos(rad_angle),
-               radius + (radius - border_width - 15) * math.sin(rad_angle))
-        pygame.draw.line(container, COLORS["white"], start, end, 2)
-
-    for vs_mark in range(-20, 21, 2):
-        angle = start_angle + (vs_mark / max_vs) * scale_range
-        rad_angle = math.radians(angle)
-
-        if vs_mark % 10 == 0:
-            length = 15
-            text = font.render(str(abs(vs_mark)), True, COL-ORS["white"])
-            text_rect = text.get_rect(
-                center=(radius + (radius - 30) * math.cos(rad_angle),
-                        radius + (radius - 30) * math.sin(rad_angle)))
-            container.blit(text, text_rect)
-        else:
-            length = 8
-
-            start = (radius + (radius - border_width) * math.cos(rad_angle),
-                     radius + (radius - border_width) * math.sin(rad_angle))
-            end = (radius + (radius - border_width - length) * math.cos(rad_angle),
-                   radius + (radius - border_width - length) * math.sin(rad_angle))
-            pygame.draw.line(container, COLORS["white"], start, end, 2)
-
-            arrow_angle = start_angle + (vs / max_vs) * scale_range
-            rad_angle = math.radians(arrow_angle)
-
-            arrow_length = radius - 25
-            arrow_points = [
-                (radius + arrow_length * math.cos(rad_angle),
-                 radius + arrow_length * math.sin(rad_angle)),
-                (radius + 10 * math.cos(rad_angle + math.radians(150)),
-                 radius + 10 * math.sin(rad_angle + math.radians(150))),
-                (radius + 10 * math.cos(rad_angle - math.radians(150)),
-                 radius + 10 * math.sin(rad_angle - math.radians(150)))
-            ]
-            pygame.draw.polygon(container, COLORS["white"], arrow_points)
-
-            text = font.render(f"{vs:+.1f}", True, COL-ORS["white"])
-            text_rect = text.get_rect(center=(radius, radius + 40))
-            container.blit(text, text_rect)
-            surface.blit(container, (x, y))
+    surface.blit(get_gauge_face("vsi", size, build_vsi_face), (x, y))
+
+    arrow_angle = start_angle + (vs / max_vs) * scale_range
+    draw_needle(surface, x + radius, y + radius, math.radians(arrow_angle), radius - 25 * scale, 10 * scale)
+
+    text = render_text(f"{vs:+.1f}", scaled(24, scale), COLORS["white"])
+    text_rect = text.get_rect(center=(x + radius, y + radius + 40 * scale))
+    surface.blit(text, text_rect)
+
+
 params = [True] * 10
 roll = math.radians(10)
 pitch = math.radians(-5)
@@ -391,338 +447,638 @@ engine_rpm = 2000
 temp = 19
 t_eng = 690
 oil = 9
-def draw_altimeter(surface, altitude, x, y, size):
-    radius = size // 2
-    border_width = 5
-    font = pygame.font.Font(None, 24)
-    small_font = pygame.font.Font(None, 16)
-    max_altitude = 2000
+ALTIMETER_MARKS = tuple(range(0, 2001, 100))
 
-    container = pygame.Surface((size, size), pygame.SRCALPHA)
 
-    pygame.draw.circle(container, COLORS["white"], (radius, radius), radius, border_width)
+def build_altimeter_face(size):
+    radius = size // 2
+    scale = size / 200
+    border_width = scaled(5, scale)
+    major = tick_table(radius, border_width, tuple(range(-90, 271, 36)), (15 * scale,) * 11, 35 * scale)
+    table = tick_table(radius, border_width, scale_angles(ALTIMETER_MARKS, -90, -360, 2000),
+                       (8 * scale,) * len(ALTIMETER_MARKS), 35 * scale)
 
-    pygame.draw.circle(container, COLORS["black"], (radius, radius), radius - border_width)
+    container = pygame.Surface((size, size), pygame.SRCALPHA)
+    draw_gauge_bezel(container, radius, border_width)
 
-    label_text1 = small_font.render("ВЫСОТА", True, COL-ORS["yellow"])
-    label_rect1 = label_text1.get_rect(topright=(size - 75, 55))
+    label_text1 = render_text("ВЫСОТА", scaled(16, scale), COLORS["yellow"])
+    label_rect1 = label_text1.get_rect(topright=(size - 75 * scale, 55 * scale))
     container.blit(label_text1, label_rect1)
 
-    label_text = small_font.render("х100 М", True, COL-ORS["white"])
-    label_rect = label_text.get_rect(topright=(size - 83, 75))
+    label_text = render_text("х100 М", scaled(16, scale), COLORS["white"])
+    label_rect = label_text.get_rect(topright=(size - 83 * scale, 75 * scale))
     container.blit(label_text, label_rect)
 
-    for angle in range(-90, 271, 36):
-        rad_angle = math.radians(angle)
-        start = (radius + (radius - border_width) * math.cos(rad_angle),
-                 radius + (radius - border_width) * math.sin(rad_angle))
-        end = (radius + (radius - border_width - 15) * math.cos(rad_angle),
-               radius + (radius - border_width - 15) * math.sin(rad_angle))
-        pygame.draw.line(container, COLORS["white"], start, end, 2)
+    draw_ticks(container, major, width=scaled(2, scale))
+    draw_ticks(container, table, [mark % 200 != 0 for mark in ALTIMETER_MARKS], width=scaled(2, scale))
+    draw_tick_labels(container, [str(mark // 100) if mark % 200 == 0 else "" for mark in ALTIMETER_MARKS],
+                     table.labels.tolist(), font_size=scaled(24, scale))
+    return container
+
 
+def draw_altimeter(surface, altitude, x, y, size):
+    radius = size // 2
+    scale = size / 200
+    max_altitude = 2000
     start_angle = -90
     scale_range = 360
 
-    for alt_mark in range(0, max_altitude + 1, 100):
-        angle = start_angle - (alt_mark / max_altitude) * scale_range
-        rad_angle = math.radians(angle)
-
-        if alt_mark % 200 == 0:
-            length = 15
-            text = font.render(str(alt_mark // 100), True, COLORS["white"])
-            text_rect = text.get_rect(
-                center=(radius + (radius - 35) * math.cos(rad_angle),
-                        radius + (radius - 35) * math.sin(rad_angle)))
-            container.blit(text, text_rect)
-        else:
-            length = 8
-
-            start = (radius + (radius - border_width) * math.cos(rad_angle),
-                     radius + (radius - border_width) * math.sin(rad_angle))
-            end = (radius + (radius - border_width - length) * math.cos(rad_angle),
-                   radius + (radius - border_width - length) * math.sin(rad_angle))
-            pygame.draw.line(container, COLORS["white"], start, end, 2)
-
-            arrow_angle = start_angle - (altitude / max_altitude) * scale_range
-            rad_angle = math.radians(arrow_angle)
-
-            arrow_length = radius - 25
-            arrow_points = [
-                (radius + arrow_length * math.cos(rad_angle),
-                 radius + arrow_length * math.sin(rad_angle)),
-                (radius + 10 * math.cos(rad_angle + math.radians(150)),
-                 radius + 10 * math.sin(rad_angle + math.radians(150))),
-                (radius + 10 * math.cos(rad_angle - math.radians(150)),
-                 radius + 10 * math.sin(rad_angle - math.radians(150)))
-            ]
-            pygame.draw.polygon(container, COLORS["white"], arrow_points)
+    surface.blit(get_gauge_face("altimeter", size, build_altimeter_face), (x, y))
+
+    arrow_angle = start_angle - (altitude / max_altitude) * scale_range
+    draw_needle(surface, x + radius, y + radius, math.radians(arrow_angle), radius - 25 * scale, 10 * scale)
+
+    text = render_text(f"{int(altitude)}", scaled(24, scale), COLORS["white"])
+    text_rect = text.get_rect(center=(x + radius, y + radius + 30 * scale))
+    surface.blit(text, text_rect)
+
+
+NO_VALUE = "—"
+
+
+class ReadoutWidget:
+    # The frame and labels are drawn once; the value is re-rendered only when its text changes.
+    # Positions and sizes are given for a 60 px high readout and scaled with the height.
+    def __init__(self, size, labels, label_y=(10, 25), value_y=43, value_format="{}", unit="", border_width=3,
+                 label_size=24, value_size=30, unit_size=24):
+        self.width, self.height = size
+        scale = self.height / 60
+        self.labels = labels
+        self.label_y = tuple(y * scale for y in label_y)
+        self.value_y = value_y * scale
+        self.value_format = value_format
+        self.unit = unit
+        self.border_width = scaled(border_width, scale)
+        self.label_size = scaled(label_size, scale)
+        self.value_size = scaled(value_size, scale)
+        self.unit_size = scaled(unit_size, scale)
+        self.unit_gap = scaled(2, scale)
+        self.face = self.build_face()
+        self.text = None
+        self.frame = None
+
+    def build_face(self):
+        width, height = self.width, self.height
+        face = pygame.Surface((width, height))
+        face.fill(COLORS["black"])
+        pygame.draw.line(face, COLORS["black"], (0, 0), (width, 0), self.border_width)
+        pygame.draw.line(face, COLORS["black"], (0, 0), (0, height), self.border_width)
+        pygame.draw.line(face, COLORS["white"], (width, 0), (width, height), self.border_width)
+        pygame.draw.line(face, COLORS["white"], (0, height), (width, height), self.border_width)
+        for label, label_y in zip(self.labels, self.label_y):
+            label_text = render_text(label, self.label_size, COLORS["white"])
+            face.blit(label_text, label_text.get_rect(center=(width // 2, label_y)))
+        return face
+
+    def build_frame(self, text):
+        frame = self.face.copy()
+        value_text = render_text(text, self.value_size, COLORS["white"])
+        unit_text = render_text(self.unit, self.unit_size, COLORS["white"]) if self.unit and text != NO_VALUE else None
+        total_width = value_text.get_width() + (unit_text.get_width() + self.unit_gap if unit_text else 0)
+        left = (self.width - total_width) // 2
+        frame.blit(value_text, value_text.get_rect(midleft=(left, self.value_y)))
+        if unit_text is not None:
+            frame.blit(unit_text, unit_text.get_rect(midleft=(left + value_text.get_width() + self.unit_gap,
+                                                               self.value_y)))
+        return frame
+
+    def draw(self, surface, value, x, y):
+        text = NO_VALUE if value is None else self.value_format.format(value)
+        if text != self.text:
+            self.frame = self.build_frame(text)
+            self.text = text
+        surface.blit(self.frame, (x, y))
+
+
+READOUT_STYLES = {
+    "fuel": dict(labels=("заряд",), label_y=(15,), value_y=38, value_format="{}%", border_width=4, label_size=30),
+    "clock": dict(labels=("время",), label_y=(10,), value_y=33, border_width=4),
+    "rpm": dict(labels=("об/мин",), label_y=(15,), value_y=38),
+    "temperature": dict(labels=("темп-ра", "за бортом"), unit=chr(176) + "C"),
+    "temp_engine": dict(labels=("темп-ра", "двигателя"), unit=chr(176) + "C"),
+    "oil": dict(labels=("кол-во", "масла"), unit="Л"),
+    "distance": dict(labels=("путь",), label_y=(15,), value_y=38, unit="км"),
+    "ground_speed": dict(labels=("путевая", "скорость"), unit="км/ч"),
+    "waypoint": dict(labels=("до ППМ",), label_y=(15,), value_y=38, unit="км"),
+    "cross_track": dict(labels=("боковое", "уклонение"), unit="м"),
+}
 
-            text = font.render(f"{int(altitude)}", True, COL-ORS["white"])
-            text_rect = text.get_rect(center=(radius, radius + 30))
-            container.blit(text, text_rect)
 
-            surface.blit(container, (x, y))
+def draw_readout(surface, kind, value, x, y, width, height):
+    widget = get_gauge_face(kind, (width, height), lambda size: ReadoutWidget(size, **READOUT_STYLES[kind]))
+    widget.draw(surface, value, x, y)
 
 
 def draw_fuel_indicator(surface, fuel, x, y, width, height):
-    font = pygame.font.Font(None, 30)
-    border_width = 4
-
-    container = pygame.Surface((width, height), pygame.SRCALPHA)
-
-    pygame.draw.rect(container, COLORS["black"], (0, 0, width, height))
-
-    pygame.draw.line(container, COLORS["black"], (0, 0), (width, 0), border_width)
-    pygame.draw.line(container, COLORS["black"], (0, 0), (0, height), border_width)
-    pygame.draw.line(container, COLORS["white"], (width, 0), (width, height), border_width)
-    pygame.draw.line(container, COLORS["white"], (0, height), (width, height), border_width)
+    draw_readout(surface, "fuel", fuel, x, y, width, height)
 
-    label_text = font.render("заряд", True, COLORS["white"])
-    label_rect = label_text.get_rect(center=(width // 2, height // 2 - 15))
-    container.blit(label_text, label_rect)
-
-    fuel_text = font.render(f"{fuel}%", True, COLORS["white"])
-    fuel_rect = fuel_text.get_rect(center=(width // 2, height // 2 + 8))
-    container.blit(fuel_text, fuel_rect)
-
-    surface.blit(container, (x, y))
-
-def draw_clock(surface, x, y, width, height):
-    font = pygame.font.Font(None, 24)
-    clock_font = pygame.font.Font(None, 30)
-    border_width = 4
-
-    container = pygame.Surface((width, height), pygame.SRCALPHA)
-
-    pygame.draw.rect(container, COLORS["black"], (0, 0, width, height))
-
-    pygame.draw.line(container, COLORS["black"], (0, 0), (width, 0), border_width)
-    pygame.draw.line(container, COLORS["black"], (0, 0), (0, height), border_width)
-    pygame.draw.line(container, COLORS["white"], (width, 0), (width, height), border_width)
-    pygame.draw.line(container, COLORS["white"], (0, height), (width, height), border_width)
-
-    label_text = font.render("время", True, COLORS["white"])
-    label_rect = label_text.get_rect(center=(width // 2, 10))
-    container.blit(label_text, label_rect)
 
-    current_time = datetime.datetime.now().strftime("%H:%M:%S")
+def draw_clock(surface, text, x, y, width, height):
+    draw_readout(surface, "clock", text, x, y, width, height)
 
-    clock_text = clock_font.render(current_time, True, COL-ORS["white"])
-    clock_rect = clock_text.get_rect(center=(width // 2, height // 1.8))
-    container.blit(clock_text, clock_rect)
-
-    surface.blit(container, (x, y))
 
 def draw_rpm_indicator(surface, rpm, x, y, width, height):
-    font = pygame.font.Font(None, 24)
-    rpm_font = pygame.font.Font(None, 30)
-    border_width = 3
-
-    container = pygame.Surface((width, height), pygame.SRCALPHA)
-
-    pygame.draw.rect(container, COLORS["black"], (0, 0, width, height))
+    draw_readout(surface, "rpm", rpm, x, y, width, height)
 
-    pygame.draw.line(container, COLORS["black"], (0, 0), (width, 0), border_width)
-    pygame.draw.line(container, COLORS["black"], (0, 0), (0, height), border_width)
-    pygame.draw.line(container, COLORS["white"], (width, 0), (width, height), border_width)
-    pygame.draw.line(container, COLORS["white"], (0, height), (width, height), border_width)
-
-    label_text = font.render("об/мин", True, COLORS["white"])
-    label_rect = label_text.get_rect(center=(width // 2, 15))
-    container.blit(label_text, label_rect)
-
-    rpm_text = rpm_font.render(f"{rpm}", True, COL-ORS["white"])
-    rpm_rect = rpm_text.get_rect(center=(width // 2, height // 2 + 8))
-    container.blit(rpm_text, rpm_rect)
-
-    surface.blit(container, (x, y))
 
 def draw_temperature(surface, temp, x, y, width, height):
-    font = pygame.font.Font(None, 24)
-    rpm_font = pygame.font.Font(None, 30)
-    border_width = 3
-
-    container = pygame.Surface((width, height), pygame.SRCALPHA)
-
-    pygame.draw.rect(container, COLORS["black"], (0, 0, width, height))
+    draw_readout(surface, "temperature", temp, x, y, width, height)
 
-    pygame.draw.line(container, COLORS["black"], (0, 0), (width, 0), border_width)
-    pygame.draw.line(container, COLORS["black"], (0, 0), (0, height), border_width)
-    pygame.draw.line(container, COLORS["white"], (width, 0), (width, height), border_width)
-    pygame.draw.line(container, COLORS["white"], (0, height), (width, height), border_width)
-
-    label_text = font.render("темп-ра", True, COLORS["white"])
-    label_rect = label_text.get_rect(center=(width // 2, 10))
-    container.blit(label_text, label_rect)
-
-    label_text = font.render("за бортом", True, COL-ORS["white"])
-    label_rect = label_text.get_rect(center=(width // 2, 25))
-    container.blit(label_text, label_rect)
-
-    rpm_text = rpm_font.render(f"{temp}", True, COL-ORS["white"])
-    rpm_rect = rpm_text.get_rect(center=(width // 2 - 10, height // 2 + 13))
-    container.blit(rpm_text, rpm_rect)
-
-    label_text = font.render("C", True, COLORS["white"])
-    label_rect = label_text.get_rect(center=(width // 2 + 17, height // 2 + 13))
-    container.blit(label_text, label_rect)
-
-    label_text = font.render(chr(176), True, COLORS["white"])
-    label_rect = label_text.get_rect(center=(width // 2 + 9, height // 2 + 13))
-    container.blit(label_text, label_rect)
-
-    surface.blit(container, (x, y))
 
 def draw_temp_engine(surface, t_eng, x, y, width, height):
-    font = pygame.font.Font(None, 24)
-    rpm_font = pygame.font.Font(None, 30)
-    border_width = 3
-
-    container = pygame.Surface((width, height), pygame.SRCALPHA)
-
-    pygame.draw.rect(container, COLORS["black"], (0, 0, width, height))
-
-    pygame.draw.line(container, COLORS["black"], (0, 0), (width, 0), border_width)
-    pygame.draw.line(container, COLORS["black"], (0, 0), (0, height), border_width)
-    pygame.draw.line(container, COLORS["white"], (width, 0), (width, height), border_width)
-    pygame.draw.line(container, COLORS["white"], (0, height), (width, height), border_width)
-
-    label_text = font.render("темп-ра", True, COLORS["white"])
-    label_rect = label_text.get_rect(center=(width // 2, 10))
-    container.blit(label_text, label_rect)
-
-    label_text = font.render("двигателя", True, COL-ORS["white"])
-    label_rect = label_text.get_rect(center=(width // 2, 25))
-    container.blit(label_text, label_rect)
-
-    rpm_text = rpm_font.render(f"{t_eng}", True, COL-ORS["white"])
-    rpm_rect = rpm_text.get_rect(center=(width // 2 - 10, height // 2 + 13))
-    container.blit(rpm_text, rpm_rect)
+    draw_readout(surface, "temp_engine", t_eng, x, y, width, height)
 
-    label_text = font.render("C", True, COLORS["white"])
-    label_rect = label_text.get_rect(center=(width // 2 + 19, height // 2 + 13))
-    container.blit(label_text, label_rect)
-
-    label_text = font.render(chr(176), True, COLORS["white"])
-    label_rect = label_text.get_rect(center=(width // 2 + 11, height // 2 + 13))
-    container.blit(label_text, label_rect)
-
-    surface.blit(container, (x, y))
 
 def draw_oil(surface, oil, x, y, width, height):
-    font = pygame.font.Font(None, 24)
-    rpm_font = pygame.font.Font(None, 30)
-    border_width = 3
-
-    container = pygame.Surface((width, height), pygame.SRCALPHA)
+    draw_readout(surface, "oil", oil, x, y, width, height)
 
-    pygame.draw.rect(container, COLORS["black"], (0, 0, width, height))
 
-    pygame.draw.line(container, COLORS["black"], (0, 0), (width, 0), border_width)
-    pygame.draw.line(container, COLORS["black"], (0, 0), (0, height), border_width)
-    pygame.draw.line(container, COLORS["white"], (width, 0), (width, height), border_width)
-    pygame.draw.line(container, COLORS["white"], (0, height), (width, height), border_width)
-
-    label_text = font.render("кол-во", True, COLORS["white"])
-    label_rect = label_text.get_rect(center=(width // 2, 10))
-    container.blit(label_text, label_rect)
-
-    label_text = font.render("масла", True, COLORS["white"])
-    label_rect = label_text.get_rect(center=(width // 2, 25))
-    container.blit(label_text, label_rect)
+PANEL_PROPERTIES = {
+    "airspeed": ('/velocities/airspeed-kt', 30),
+    "fuel_level": ('/consumables/fuel/total-fuel-norm', 1),
+    "engine_rpm": ('/engines/engine/rpm', 5),
+    "temp": ('/environment/temperature-degc', 0.5),
+    "t_eng": ('/engines/engine/egt-degf', 2),
+    "oil": ('/engines/engine/oil-level', 1),
+}
 
-    rpm_text = rpm_font.render(f"{oil}", True, COL-ORS["white"])
-    rpm_rect = rpm_text.get_rect(center=(width // 2 - 10, height // 2 + 13))
-    container.blit(rpm_text, rpm_rect)
 
-    label_text = font.render("Л", True, COLORS["white"])
-    label_rect = label_text.get_rect(center=(width // 2 + 8, height // 2 + 13))
-    container.blit(label_text, label_rect)
+def panel_readouts(props):
+    # None for a property that is missing or expired; the readout shows a dash rather than a number.
+    def prop(name, convert):
+        value = props.get(PANEL_PROPERTIES[name][0])
+        return None if value is None else convert(value)
+
+    return (
+        prop("fuel_level", lambda value: round(value * 100)),
+        prop("engine_rpm", round),
+        prop("temp", round),
+        prop("t_eng", lambda value: round((value - 32) * 5 / 9)),
+        prop("oil", lambda value: round(value, 1)),
+    )
+
+
+def alarm_fields(snapshot):
+    fields = snapshot._asdict()
+    props = snapshot.props
+    fuel = props.get(PANEL_PROPERTIES["fuel_level"][0])
+    egt = props.get(PANEL_PROPERTIES["t_eng"][0])
+    fields["fuel_level"] = None if fuel is None else fuel * 100
+    fields["engine_rpm"] = props.get(PANEL_PROPERTIES["engine_rpm"][0])
+    fields["t_eng"] = None if egt is None else (egt - 32) * 5 / 9
+    fields["gps_fix"] = 0.0 if snapshot.lat_deg == 0 and snapshot.lon_deg == 0 else 1.0
+    return fields
+
+
+class PanelRenderer:
+    def __init__(self, surface, dirty_rects=False, profiler=None, layout=None):
+        self.surface = surface
+        self.dirty_rects = dirty_rects
+        self.profiler = profiler
+        self.layout = layout or get_default_layout()
+        self.widget_rects = self.layout.resolve(*surface.get_size())
+        self.last_inputs = {}
+        self.rects = []
+        self.full_update = True
+
+    def set_surface(self, surface):
+        self.surface = surface
+        self.widget_rects = self.layout.resolve(*surface.get_size())
+        self.invalidate()
+
+    def invalidate(self):
+        self.last_inputs.clear()
+        self.full_update = True
+
+    def begin_frame(self):
+        if not self.dirty_rects or self.full_update:
+            self.surface.fill(COLORS["background"])
+
+    def draw(self, name, rect, inputs, draw_fn, *args):
+        if self.dirty_rects and not self.full_update:
+            if name in self.last_inputs and self.last_inputs[name] == inputs:
+                return
+            self.surface.fill(COLORS["background"], rect)
+            self.rects.append(pygame.Rect(rect))
+        self.last_inputs[name] = inputs
+        if self.profiler is None:
+            draw_fn(self.surface, *args)
+        else:
+            started = time.perf_counter()
+            draw_fn(self.surface, *args)
+            self.profiler.add(name, time.perf_counter() - started)
+
+    def end_frame(self):
+        if not self.dirty_rects or self.full_update:
+            pygame.display.flip()
+        elif self.rects:
+            pygame.display.update(self.rects)
+        self.rects = []
+        self.full_update = False
+
+
+def clear_static_caches():
+    # Faces, readouts and sensor strips are cached per pixel size; after a resize the old sizes are dead weight.
+    gauge_faces.clear()
+    sensor_strips.clear()
+    tick_table.cache_clear()
+
+
+def navigation_readouts(navigation):
+    to_waypoint = navigation.to_waypoint()
+    cross_track_m = navigation.cross_track_m()
+    return (
+        f"{navigation.distance_m / 1000:.1f}",
+        f"{navigation.ground_speed_mps * 3.6:.0f}",
+        None if to_waypoint is None else f"{to_waypoint[0] / 1000:.1f}",
+        None if cross_track_m is None else f"{cross_track_m:+.0f}",
+    )
+
+
+def draw_moving_map(surface, moving_map, lat_deg, lon_deg, heading_rad, x, y, width, height):
+    moving_map.draw(surface, x, y, width, height, lat_deg, lon_deg, heading_rad, COLORS)
+
+
+def draw_panel(panel, snapshot, alarms, moving_map=None, navigation=None, clock_time=None):
+    # clock_time is the wall-clock time to show, the record's own for a recorded flight; None for now.
+    speed = snapshot.airspeed
+    lat_deg, lon_deg, alt_m, agl_m, phi_rad, theta_rad, psi_rad, climb_rate = snapshot[:8]
+    fuel_level, engine_rpm, temp, t_eng, oil = panel_readouts(snapshot.props)
+    rects = panel.widget_rects
+    panel.begin_frame()
+    rect = rects["sensors"]
+    panel.draw("sensors", rect, alarms.mask,
+               draw_top_sensors, alarms.abbreviations, alarms.mask, *rect)
+    rect = rects["attitude"]
+    panel.draw("attitude", rect, (phi_rad, theta_rad),
+               draw_attitude_indicator, phi_rad, theta_rad, rect.x, rect.y, rect.width)
+    rect = rects["heading"]
+    panel.draw("heading", rect, psi_rad,
+               draw_heading_indicator, psi_rad, rect.x, rect.y, rect.width)
+    rect = rects["speed"]
+    panel.draw("speed", rect, speed,
+               draw_speed_indicator, speed, rect.x, rect.y, rect.width)
+    rect = rects["vsi"]
+    panel.draw("vsi", rect, climb_rate,
+               draw_vsi_indicator, climb_rate / 3.281, rect.x, rect.y, rect.width)
+    rect = rects["altimeter"]
+    panel.draw("altimeter", rect, alt_m,
+               draw_altimeter, alt_m, rect.x, rect.y, rect.width)
+    panel.draw("fuel", rects["fuel"], fuel_level,
+               draw_fuel_indicator, fuel_level, *rects["fuel"])
+    clock = datetime.datetime.now() if clock_time is None else datetime.datetime.fromtimestamp(clock_time)
+    clock_text = clock.strftime("%H:%M:%S")
+    panel.draw("clock", rects["clock"], clock_text,
+               draw_clock, clock_text, *rects["clock"])
+    panel.draw("rpm", rects["rpm"], engine_rpm,
+               draw_rpm_indicator, engine_rpm, *rects["rpm"])
+    panel.draw("temperature", rects["temperature"], temp,
+               draw_temperature, temp, *rects["temperature"])
+    panel.draw("temp_engine", rects["temp_engine"], t_eng,
+               draw_temp_engine, t_eng, *rects["temp_engine"])
+    panel.draw("oil", rects["oil"], oil,
+               draw_oil, oil, *rects["oil"])
+    # The rest are optional: a layout without a rect for a widget simply doesn't show it.
+    if navigation is not None:
+        for kind, text in zip(("distance", "ground_speed", "waypoint", "cross_track"),
+                              navigation_readouts(navigation)):
+            if kind in rects:
+                panel.draw(kind, rects[kind], text, draw_readout, kind, text, *rects[kind])
+    if moving_map is not None and "map" in rects:
+        panel.draw("map", rects["map"], moving_map.state(lat_deg, lon_deg, psi_rad),
+                   draw_moving_map, moving_map, lat_deg, lon_deg, psi_rad, *rects["map"])
+
+
+def draw_profiler_overlay(surface, rows, x, y, width, height):
+    scale = min(width / 230, height / 370)
+    font_size = scaled(16, scale)
+    row_height = 17 * scale
+    pygame.draw.rect(surface, COLORS["black"], (x, y, width, height))
+    pygame.draw.rect(surface, COLORS["white"], (x, y, width, height), 1)
+    columns = (x + 8 * scale, x + 120 * scale, x + 175 * scale)
+    for column, title in zip(columns, ("этап", "p50", "p99 мс")):
+        surface.blit(render_text(title, font_size, COLORS["yellow"]), (column, y + 6 * scale))
+    for i, row in enumerate(rows[:int((height - 26 * scale) // row_height)]):
+        row_y = y + 26 * scale + i * row_height
+        for column, text in zip(columns, (row[0], f"{row[1]:.2f}", f"{row[2]:.2f}")):
+            surface.blit(render_text(text, font_size, COLORS["white"]), (column, row_y))
+
+
+def profiler_rows(profiler):
+    return tuple((name, p50 * 1000, p99 * 1000) for name, _, _, p50, p99, _ in profiler.summary())
+
+
+def display_refresh_rate(default=60):
+    get_rates = getattr(pygame.display, "get_desktop_refresh_rates", None)
+    rates = get_rates() if get_rates is not None else []
+    return max(rates) if rates and max(rates) > 0 else default
+
+
+def parse_waypoint(text):
+    lat, lon = (float(value) for value in text.split(","))
+    return lat, lon
+
+
+def parse_layout(path):
+    try:
+        return PanelLayout.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def open_display(size, caption="Helicopter Instruments Panel"):
+    pygame.init()
+    screen = pygame.display.set_mode(size, RESIZABLE)
+    pygame.display.set_caption(caption)
+    return screen
+
+
+class PanelApp:
+    # Everything with side effects (window, connections, worker processes) is created here at run
+    # time, so importing bpla stays cheap and headless tools can use the drawing code directly.
+    def __init__(self, args):
+        self.args = args
+        self.startup = {"import_ms": (time.perf_counter() - IMPORT_STARTED) * 1000}
+        self.layout = args.layout or get_default_layout()
+        self.screen = None
+        self.clock = None
+        self.panel = None
+        self.telemetry = None
+        self.replay = None
+        self.map_exporter = None
+        self.moving_map = None
+        self.navigation = LiveNavigation(waypoint=args.waypoint)
+        self.recorder = None
+        self.fanout = None
+        self.gui_ring = None
+        self.alarms = AlarmEngine()
+        self.filters = None if args.no_filter else FilterStage(filter_config(args.filter))
+        self.interpolator = None
+        self.pacer = None
+        self.profiler = Profiler(enabled=args.profile)
+        self.show_profiler = False
+        self.profiling_before_overlay = args.profile
+        self.profiler_rows = ()
+        self.profiler_refresh = 0.0
+        self.last_gui_time = None
+
+    def mark_startup(self, name):
+        # Milliseconds since bpla started importing, cumulative per phase.
+        self.startup[name] = (time.perf_counter() - IMPORT_STARTED) * 1000
+
+    def open_display(self):
+        args = self.args
+        window_size = tuple(int(value) for value in args.size.lower().split("x")) if args.size else self.layout.window
+        self.screen = open_display(window_size)
+        self.clock = pygame.time.Clock()
+        self.panel = PanelRenderer(self.screen, dirty_rects=args.dirty_rects, layout=self.layout)
+        self.panel.profiler = self.profiler if self.profiler.enabled else None
+        self.mark_startup("display_ms")
+
+    def draw_first_frame(self):
+        # Drawn before any connection is made, so the window shows the panel (with the link alarm lit)
+        # without waiting for FlightGear.
+        self.alarms.update(alarm_fields(EMPTY_SNAPSHOT), time.monotonic())
+        draw_panel(self.panel, EMPTY_SNAPSHOT, self.alarms)
+        self.panel.end_frame()
+        self.mark_startup("first_frame_ms")
+
+    def open_telemetry(self):
+        args = self.args
+        if args.replay:
+            from replay import ReplaySource
+            self.replay = self.telemetry = ReplaySource(args.replay, speed=args.replay_speed)
+        elif args.remote:
+            from fanout import RemoteFeed, parse_address
+            self.telemetry = RemoteFeed(*parse_address(args.remote))
+            # The alarm mask comes from the panel being watched, which also has the engine properties.
+            self.alarms = self.telemetry.alarms
+        else:
+            from functools import partial
+            from flightgear_python.fg_if import GuiConnection
+            from props import BatchTelnetConnection, PropertyPoller
 
-    surface.blit(container, (x, y))
-
-def get_top_sensors_data():
-  return [
-      {"name": "Потеря связи", "abbreviation": "ПС", "value": False},
-      {"name": "Низкий заряд", "abbreviation": "НЗ", "value": False},
-      {"name": "Ошибка двигателя", "abbreviation": "ОД", "val-ue": False},
-      {"name": "Ошибка датчика", "abbreviation": "ОДТ", "val-ue": False},
-      {"name": "Потеря ориентации", "abbreviation": "ПО", "value": False},
-      {"name": "Ошибка стабилизации", "abbreviation": "ОС", "value": False},
-      {"name": "Перегрев", "abbreviation": "ПГ", "value": False},
-      {"name": "Сильная вибрация", "abbreviation": "СВ", "val-ue": False},
-      {"name": "Нет сигнала GPS", "abbreviation": "GPS", "val-ue": False},
-      {"name": "Ошибка высоты", "abbreviation": "ОВ", "value": False},
-  ]
-
-font = pygame.font.Font(None, 24)
-if __name__ == '__main__':
-    gui_conn = GuiConnection()
-    gui_event_pipe = gui_conn.connect_rx('localhost', 5505, gui_callback)
-    gui_conn.start()
-    telnet_conn = TelnetConnection('localhost', 5500)
-    telnet_conn.connect()
-    running = True
-    while running:
+            gui_conn = GuiConnection()
+            if args.gui_pipe:
+                gui_event_pipe = gui_conn.connect_rx('localhost', 5505, gui_callback)
+            else:
+                from shm_ring import ShmRing
+                self.gui_ring = ShmRing()
+                gui_event_pipe = gui_conn.connect_rx('localhost', 5505, partial(gui_ring_callback, self.gui_ring.name))
+            gui_conn.start()
+            telnet_conn = BatchTelnetConnection('localhost', 5500)
+            telnet_conn.connect()
+            poller = PropertyPoller(telnet_conn, {path: rate for path, rate in PANEL_PROPERTIES.values()})
+            self.telemetry = TelemetryFeed(gui_event_pipe, poller, airspeed_prop=PANEL_PROPERTIES["airspeed"][0],
+                                           gui_ring=self.gui_ring)
+        self.telemetry.start()
+        if args.adaptive:
+            self.interpolator = SnapshotInterpolator()
+            self.pacer = FramePacer(args.display_fps or display_refresh_rate(), idle_fps=args.idle_fps)
+        self.mark_startup("telemetry_ms")
+
+    def open_outputs(self):
+        args = self.args
+        if not args.no_map:
+            from map_export import MapExporter
+            self.map_exporter = MapExporter(interval_s=args.map_interval, min_move_m=args.map_min_move,
+                                            open_browser=not args.no_browser, tolerance_m=args.track_tolerance,
+                                            max_points=args.track_max_points)
+            self.map_exporter.start()
+        if args.tiles:
+            from moving_map import MovingMap, open_tile_source
+            self.moving_map = MovingMap(open_tile_source(args.tiles), zoom=args.map_zoom,
+                                        max_bytes=args.tile_cache_mb << 20)
+            self.moving_map.start()
+        if args.record:
+            from recorder import FlightRecorder
+            self.recorder = FlightRecorder(args.record)
+        if args.serve:
+            from fanout import FanoutServer, parse_address
+            host, port = parse_address(args.serve, default_host="0.0.0.0")
+            self.fanout = FanoutServer(host, port, websocket_port=args.serve_websocket, max_rate=args.serve_rate)
+            self.fanout.start()
+
+    def handle_events(self):
+        panel = self.panel
+        profiler = self.profiler
+        replay = self.replay
+        running = True
+        resized = False
         for event in pygame.event.get():
             if event.type == QUIT:
                 running = False
-        speed = telnet_conn.get_prop('/velocities/airspeed-kt')
-        pipe_data = gui_event_pipe.parent_recv()
-        lat_deg, lon_deg, alt_m, agl_m, phi_rad, theta_rad, psi_rad, climb_rate = 	pipe_data
-        screen.fill(COLORS["background"])
-        sensor_data = get_top_sensors_data()
-        draw_top_sensors(screen, sensor_data)
-        draw_attitude_indicator(screen, math.radians(phi_rad), math.radians(theta_rad), 450, 100, 300)
-        draw_heading_indicator(screen, math.radians(psi_rad), 500, 450, 200)
-        draw_speed_indicator(screen, speed, 150, 155, 200)
-        draw_vsi_indicator(screen, climb_rate / 3.281, 750, 400, 200)
-        draw_altimeter(screen, alt_m, 250, 400, 200)
-        draw_fuel_indicator(screen, fuel_level, 800, 180, 100, 60)
-        draw_clock(screen, 800, 100, 100, 60)
-        draw_rpm_indicator(screen, engine_rpm, 800, 260, 100, 60)
-        draw_temperature(screen, temp, 940, 100, 100, 60)
-        draw_temp_engine(screen, t_eng, 940, 180, 100, 60)
-        draw_oil(screen, oil, 940, 260, 100, 60)
-        pygame.display.flip()
-        clock.tick(30)
-        latitude = 54.524580
-        longitude = 39.701148
-        m = folium.Map(location=[latitude, longitude], zoom_start=15)
-        arrow_icon_url = "https://cdn-icons-png.flaticon.com/128/635/635717.png"
-        arrow_icon = CustomIcon(
-    icon_image=arrow_icon_url,
-    icon_size=(40, 40),
-    icon_anchor=(20, 20),
-        )
-        folium.Marker(
-    location=[latitude, longitude],
-    popup="Начальная точка",
-    icon=arrow_icon,
-        ).add_to(m)
-        line_points = [
-    [latitude, longitude],
-    [latitude - 0.01, longitude + 0.01],
-    [latitude + 0.01, longitude - 0.01],
-    [latitude + 0.02, longitude - 0.01],
-        ]
-        folium.PolyLine(
-    locations=line_points,
-    color="blue",
-    weight=3,
-    opacity=0.8,
-        ).add_to(m)
-        for point in line_points:
-            folium.CircleMarker(
-        location=point,
-        radius=3,
-        color="red",
-        fill=True,
-        fill_color="red",
-        fill_opacity=1.0,
-        popup=f"Точка: {point}",
-            ).add_to(m)
-        m.save("helicopter_path_with_dots.html")
-        import webbrowser
-        webbrowser.open("helicopter_path_with_dots.html")
-    pygame.quit()
+            elif event.type == VIDEOEXPOSE:
+                panel.invalidate()
+            elif event.type == VIDEORESIZE:
+                resized = True
+            elif event.type == KEYDOWN and event.key == K_F3:
+                self.show_profiler = not self.show_profiler
+                # The overlay needs timings; hiding it goes back to whatever --profile asked for.
+                if self.show_profiler:
+                    self.profiling_before_overlay = profiler.enabled
+                    profiler.enable()
+                else:
+                    profiler.enabled = self.profiling_before_overlay
+                panel.profiler = profiler if profiler.enabled else None
+                panel.invalidate()
+            elif event.type == KEYDOWN and event.key == K_F4 and profiler.enabled:
+                profiler.dump_csv(self.args.profile_csv)
+            elif event.type == KEYDOWN and replay is not None:
+                if event.key == K_SPACE:
+                    replay.toggle_pause()
+                elif event.key == K_RIGHT:
+                    replay.step(1)
+                    self.navigation.reset_anchor()
+                elif event.key == K_LEFT:
+                    replay.step(-1)
+                    self.navigation.reset_anchor()
+                elif event.key == K_UP:
+                    replay.set_speed(replay.speed * 2)
+                elif event.key == K_DOWN:
+                    replay.set_speed(replay.speed / 2)
+        if resized:
+            # A drag delivers a burst of resize events, the caches are rebuilt once for the final size.
+            self.screen = pygame.display.get_surface()
+            clear_static_caches()
+            panel.set_surface(self.screen)
+        return running
+
+    def frame(self):
+        panel = self.panel
+        profiler = self.profiler
+        snapshot = self.telemetry.latest()
+        now = self.replay.position if self.replay is not None else time.monotonic()
+        self.alarms.update(alarm_fields(snapshot), now)
+        fresh = snapshot.gui_time != self.last_gui_time
+        # Recorded samples carry this same timestamp, so filters.filter_log over a recording
+        # reproduces the filtered values the panel showed.
+        sample_time = snapshot.gui_time if self.replay is not None else time.time()
+        shown = snapshot
+        if self.filters is not None:
+            shown = self.filters.update(sample_time, snapshot) if fresh else self.filters.apply(snapshot)
+        if self.interpolator is not None:
+            self.interpolator.push(shown, time.monotonic())
+            shown = self.interpolator.at(now)
+        profiler.mark("telemetry")
+        draw_panel(panel, shown, self.alarms, self.moving_map, self.navigation,
+                   clock_time=self.replay.position if self.replay is not None else None)
+        profiler.mark("draw_panel")
+        if self.show_profiler and "profiler" in panel.widget_rects:
+            # Percentiles are recomputed twice a second, the overlay itself is redrawn only then.
+            if time.monotonic() - self.profiler_refresh >= 0.5:
+                self.profiler_rows = profiler_rows(profiler)
+                self.profiler_refresh = time.monotonic()
+            rect = panel.widget_rects["profiler"]
+            panel.draw("profiler", rect, self.profiler_rows, draw_profiler_overlay, self.profiler_rows, *rect)
+        panel.end_frame()
+        profiler.mark("flip")
+        if self.fanout is not None and (fresh or self.alarms.changed):
+            self.fanout.publish(snapshot, self.alarms.mask)
+        if fresh:
+            if self.recorder is not None:
+                self.recorder.record(snapshot, sample_time)
+            if self.map_exporter is not None:
+                self.map_exporter.submit(snapshot.lat_deg, snapshot.lon_deg)
+            if self.moving_map is not None:
+                self.moving_map.add_track_point(snapshot.lat_deg, snapshot.lon_deg)
+            self.navigation.update(snapshot.gui_time, snapshot.lat_deg, snapshot.lon_deg)
+        self.last_gui_time = snapshot.gui_time
+        profiler.mark("map")
+
+    def run(self):
+        self.open_display()
+        self.draw_first_frame()
+        if self.args.exit_after_first_frame:
+            self.close()
+            return
+        self.open_telemetry()
+        self.open_outputs()
+        profiler = self.profiler
+        running = True
+        while running:
+            profiler.start_frame()
+            running = self.handle_events()
+            profiler.mark("events")
+            self.frame()
+            profiler.end_frame()
+            fps = self.pacer.fps(self.interpolator, time.monotonic()) if self.pacer is not None else self.args.fps
+            self.clock.tick(fps)
+        self.close()
+
+    def close(self):
+        if self.telemetry is not None:
+            self.telemetry.stop()
+        if self.gui_ring is not None:
+            self.gui_ring.close(unlink=True)
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.map_exporter is not None:
+            self.map_exporter.stop()
+        if self.moving_map is not None:
+            self.moving_map.stop()
+        if self.fanout is not None:
+            self.fanout.stop()
+            print("fan-out:", self.fanout.stats())
+        print("startup:", ", ".join(f"{name} {value:.0f}" for name, value in self.startup.items()))
+        print("text cache:", text_cache.stats())
+        if self.profiler.enabled:
+            self.profiler.dump_csv(self.args.profile_csv)
+        if self.args.startup_report:
+            with open(self.args.startup_report, "w") as f:
+                json.dump(self.startup, f, indent=2)
+        pygame.quit()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Helicopter instruments panel")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="redraw only widgets whose inputs changed")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--no-map", action="store_true", help="do not export the folium map")
+    parser.add_argument("--map-interval", type=float, default=5.0,
+                        help="minimum seconds between map regenerations")
+    parser.add_argument("--map-min-move", type=float, default=10.0,
+                        help="regenerate the map only after moving this many meters")
+    parser.add_argument("--no-browser", action="store_true", help="do not open the map in a browser")
+    parser.add_argument("--track-tolerance", type=float, default=5.0,
+                        help="allowed track simplification error in meters")
+    parser.add_argument("--track-max-points", type=int, default=2000,
+                        help="maximum number of track points kept for the map")
+    parser.add_argument("--tiles", metavar="PATH",
+                        help="show a moving map from an MBTiles file or a {z}/{x}/{y}.png tile directory")
+    parser.add_argument("--map-zoom", type=int, default=15, help="zoom level of the moving map")
+    parser.add_argument("--tile-cache-mb", type=int, default=64, help="memory for decoded map tiles")
+    parser.add_argument("--waypoint", metavar="LAT,LON", type=parse_waypoint,
+                        help="show distance and cross-track error to this waypoint")
+    parser.add_argument("--record", metavar="PATH", help="record telemetry to a binary flight log")
+    parser.add_argument("--replay", metavar="PATH", help="drive the panel from a recorded flight")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="playback speed, 0.25 to 16")
+    parser.add_argument("--gui-pipe", action="store_true",
+                        help="pass GUI samples through a pipe instead of the shared-memory ring")
+    parser.add_argument("--remote", metavar="HOST:PORT", help="show the telemetry another panel serves with --serve")
+    parser.add_argument("--serve", metavar="[HOST:]PORT", help="re-broadcast telemetry and alarms to remote viewers")
+    parser.add_argument("--serve-websocket", metavar="PORT", type=int, help="also serve WebSocket viewers on PORT")
+    parser.add_argument("--serve-rate", type=float, default=30.0, help="maximum updates per second per viewer")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="interpolate between samples at the display rate, idle when nothing changes")
+    parser.add_argument("--display-fps", type=int, default=None,
+                        help="frame rate while data changes in adaptive mode, defaults to the display refresh rate")
+    parser.add_argument("--idle-fps", type=int, default=5, help="frame rate while idle in adaptive mode")
+    parser.add_argument("--filter", action="append", default=[], type=filter_spec,
+                        metavar="CHANNEL=KIND[:NAME=VALUE,...]",
+                        help="filter a telemetry channel with ema, alpha_beta, kalman or none, repeatable")
+    parser.add_argument("--no-filter", action="store_true", help="show raw climb rate and attitude")
+    parser.add_argument("--layout", metavar="PATH", type=parse_layout,
+                        help="panel layout JSON, defaults to panel_layout.json")
+    parser.add_argument("--size", metavar="WIDTHxHEIGHT", help="initial window size, defaults to the layout's")
+    parser.add_argument("--profile", action="store_true",
+                        help="collect per-stage timings from the start, F3 toggles the overlay")
+    parser.add_argument("--profile-csv", metavar="PATH", default="profile.csv",
+                        help="where F4 and exit write the collected timings")
+    parser.add_argument("--startup-report", metavar="PATH", help="write startup timings as JSON on exit")
+    parser.add_argument("--exit-after-first-frame", action="store_true",
+                        help="quit as soon as the first frame is shown, for startup measurements")
+    args = parser.parse_args()
+
+    PanelApp(args).run()
@@ -0,0 +1,524 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import socket
+import struct
+import threading
+import time
+
+from alarms import DEFAULT_RULES
+from profiler import percentile
+from telemetry import EMPTY_SNAPSHOT, GUI_FIELDS
+
+PROTOCOL_VERSION = 1
+HELLO = 0
+SNAPSHOT = 1
+# type, seq, publish wall time, lat/lon as doubles, the other GUI fields and airspeed as floats,
+# sample ages (NaN when there is no sample yet) and the alarm bitmask: 72 bytes per snapshot.
+SNAPSHOT_STRUCT = struct.Struct("<BxxxIddd6ffffI")
+FRAME_HEADER = struct.Struct("<H")
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+# Clients only ever send short control messages ("rate 10"), pings and close frames.
+MAX_CLIENT_MESSAGE = 1024
+
+
+def encode_snapshot(seq, snapshot, mask, now=None, wall_time=None):
+    now = time.monotonic() if now is None else now
+    gui_age = now - snapshot.gui_time if snapshot.gui_time is not None else math.nan
+    airspeed_age = now - snapshot.airspeed_time if snapshot.airspeed_time is not None else math.nan
+    return SNAPSHOT_STRUCT.pack(SNAPSHOT, seq & 0xFFFFFFFF, time.time() if wall_time is None else wall_time,
+                                *snapshot[:len(GUI_FIELDS)], snapshot.airspeed, gui_age, airspeed_age, mask)
+
+
+def decode_snapshot(payload, now=None):
+    # Ages are turned back into timestamps on the receiver's own clock.
+    now = time.monotonic() if now is None else now
+    (_, seq, sent, *values, airspeed, gui_age, airspeed_age, mask) = SNAPSHOT_STRUCT.unpack(payload)
+    snapshot = EMPTY_SNAPSHOT._replace(airspeed=airspeed,
+                                       gui_time=None if math.isnan(gui_age) else now - gui_age,
+                                       airspeed_time=None if math.isnan(airspeed_age) else now - airspeed_age,
+                                       **dict(zip(GUI_FIELDS, values)))
+    return seq, sent, snapshot, mask
+
+
+def hello_payload(rules, max_rate):
+    link_alarm = next((bit for bit, rule in enumerate(rules) if rule.field == "gui_time"), None)
+    info = {"version": PROTOCOL_VERSION, "alarms": [rule.abbreviation for rule in rules],
+            "link_alarm": link_alarm, "fields": list(GUI_FIELDS) + ["airspeed"], "max_rate": max_rate}
+    return bytes((HELLO,)) + json.dumps(info, ensure_ascii=False).encode()
+
+
+def websocket_frame(payload, opcode=0x2):
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+class Subscriber:
+    def __init__(self, writer, websocket, max_rate):
+        self.writer = writer
+        self.websocket = websocket
+        self.min_interval = 1.0 / max_rate
+        self.pending = None
+        self.ready = asyncio.Event()
+        self.last_send = -math.inf
+        self.sent = 0
+        self.conflated = 0
+        self.closed = False
+
+    def set_rate(self, rate, max_rate):
+        self.min_interval = 1.0 / min(max(rate, 0.1), max_rate)
+
+    def offer(self, payload):
+        if self.pending is not None:
+            self.conflated += 1
+        self.pending = payload
+        self.ready.set()
+
+    def frame(self, payload):
+        if self.websocket:
+            return websocket_frame(payload)
+        return FRAME_HEADER.pack(len(payload)) + payload
+
+
+class FanoutServer:
+    # Runs its own event loop in a background thread; the render loop only calls publish().
+    # Each subscriber holds just the newest snapshot, so a client reading slower than its rate gets
+    # skipped samples rather than a backlog, and one whose socket stops draining is disconnected.
+    def __init__(self, host="0.0.0.0", port=5510, websocket_port=None, max_rate=30.0, rules=DEFAULT_RULES,
+                 max_buffer=4096, send_buffer=4096):
+        self.host = host
+        self.port = port
+        self.websocket_port = websocket_port
+        self.max_rate = max_rate
+        self.max_buffer = max_buffer
+        self.send_buffer = send_buffer
+        self.hello = hello_payload(rules, max_rate)
+        self.subscribers = set()
+        self.latest = None
+        self.seq = 0
+        self.loop = None
+        self.servers = []
+        self.thread = None
+        self.started = threading.Event()
+        self.startup_error = None
+        self.peak_subscribers = 0
+        self.dropped_slow = 0
+        self.published = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run_loop, name="telemetry-fanout", daemon=True)
+        self.thread.start()
+        self.started.wait(5.0)
+        if self.startup_error is not None:
+            self.thread.join()
+            self.thread = None
+            raise self.startup_error
+
+    def run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self.open_servers())
+        except Exception as e:
+            # A port already in use, say: start() raises it in the caller's thread.
+            self.startup_error = e
+            for server in self.servers:
+                server.close()
+            self.loop.close()
+            return
+        finally:
+            self.started.set()
+        self.loop.run_forever()
+        for server in self.servers:
+            server.close()
+        for subscriber in list(self.subscribers):
+            subscriber.writer.close()
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.loop.close()
+
+    async def open_servers(self):
+        self.servers.append(await asyncio.start_server(self.serve_tcp, self.host, self.port))
+        if self.websocket_port is not None:
+            self.servers.append(await asyncio.start_server(self.serve_websocket, self.host, self.websocket_port))
+
+    def stop(self):
+        if self.loop is not None and self.thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def publish(self, snapshot, mask):
+        # Called from the render thread: encode here, hand over a bytes object, never wait.
+        # Without a running loop nothing would ever drain the handles call_soon_threadsafe queues.
+        if self.loop is None or not self.loop.is_running():
+            return
+        self.seq += 1
+        payload = encode_snapshot(self.seq, snapshot, mask)
+        self.loop.call_soon_threadsafe(self.broadcast, payload)
+
+    def broadcast(self, payload):
+        self.latest = payload
+        self.published += 1
+        for subscriber in self.subscribers:
+            subscriber.offer(payload)
+
+    def stats(self):
+        return {"subscribers": len(self.subscribers), "peak_subscribers": self.peak_subscribers,
+                "published": self.published, "dropped_slow": self.dropped_slow}
+
+    def limit_send_buffer(self, writer):
+        # A small kernel buffer keeps queued data (and so latency) bounded, and lets a stalled
+        # reader show up in the transport's own buffer quickly.
+        sock = writer.get_extra_info("socket")
+        if sock is not None and self.send_buffer:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    async def serve_tcp(self, reader, writer):
+        await self.serve(reader, writer, websocket=False)
+
+    async def serve_websocket(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5.0)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        lines = request.decode("latin-1").split("\r\n")
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if key is None:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            writer.close()
+            return
+        accept = base64.b64encode(hashlib.sha1(key.encode() + WEBSOCKET_GUID).digest())
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        # "GET /?rate=10 HTTP/1.1"
+        path = lines[0].split(" ")[1] if len(lines[0].split(" ")) > 1 else "/"
+        rate = None
+        for item in path.partition("?")[2].split("&"):
+            name, _, value = item.partition("=")
+            if name == "rate":
+                try:
+                    rate = float(value)
+                except ValueError:
+                    pass
+        await self.serve(reader, writer, websocket=True, rate=rate)
+
+    async def serve(self, reader, writer, websocket, rate=None):
+        self.limit_send_buffer(writer)
+        subscriber = Subscriber(writer, websocket, self.max_rate)
+        if rate is not None:
+            subscriber.set_rate(rate, self.max_rate)
+        self.subscribers.add(subscriber)
+        self.peak_subscribers = max(self.peak_subscribers, len(self.subscribers))
+        writer.write(subscriber.frame(self.hello))
+        if self.latest is not None:
+            subscriber.offer(self.latest)
+        sender = asyncio.ensure_future(self.send_loop(subscriber))
+        try:
+            if websocket:
+                await self.read_websocket(reader, subscriber)
+            else:
+                await self.read_tcp(reader, subscriber)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.disconnect(subscriber)
+            sender.cancel()
+
+    def disconnect(self, subscriber):
+        if not subscriber.closed:
+            subscriber.closed = True
+            self.subscribers.discard(subscriber)
+            subscriber.writer.close()
+
+    async def send_loop(self, subscriber):
+        loop = asyncio.get_running_loop()
+        transport = subscriber.writer.transport
+        while not subscriber.closed:
+            await subscriber.ready.wait()
+            wait = subscriber.last_send + subscriber.min_interval - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            subscriber.ready.clear()
+            payload = subscriber.pending
+            subscriber.pending = None
+            if payload is None or subscriber.closed:
+                continue
+            if transport.get_write_buffer_size() > self.max_buffer:
+                # close() would wait to flush a buffer that is never going to drain.
+                self.dropped_slow += 1
+                transport.abort()
+                self.disconnect(subscriber)
+                break
+            subscriber.writer.write(subscriber.frame(payload))
+            subscriber.last_send = loop.time()
+            subscriber.sent += 1
+
+    def control(self, subscriber, text):
+        # The only request a client can make: "rate 10" caps its updates per second.
+        command, _, value = text.strip().partition(" ")
+        if command == "rate":
+            try:
+                subscriber.set_rate(float(value), self.max_rate)
+            except ValueError:
+                pass
+
+    async def read_tcp(self, reader, subscriber):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            self.control(subscriber, line.decode("utf-8", "replace"))
+
+    async def read_websocket(self, reader, subscriber):
+        while True:
+            first, second = await reader.readexactly(2)
+            opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length, = struct.unpack("!H", await reader.readexactly(2))
+            elif length == 127:
+                length, = struct.unpack("!Q", await reader.readexactly(8))
+            if length > MAX_CLIENT_MESSAGE:
+                # 1009: message too big. The length is checked before anything is read or allocated.
+                subscriber.writer.write(websocket_frame(struct.pack("!H", 1009), opcode=0x8))
+                return
+            mask = await reader.readexactly(4) if second & 0x80 else b"\0\0\0\0"
+            data = bytes(b ^ mask[i % 4] for i, b in enumerate(await reader.readexactly(length)))
+            if opcode == 0x8:
+                subscriber.writer.write(websocket_frame(b"", opcode=0x8))
+                return
+            if opcode == 0x9:
+                subscriber.writer.write(websocket_frame(data, opcode=0xA))
+            elif opcode == 0x1:
+                self.control(subscriber, data.decode("utf-8", "replace"))
+
+
+class RemoteAlarms:
+    # Stands in for AlarmEngine on a viewer: the mask comes from the server, only the loss of the
+    # link to the server itself is judged locally.
+    def __init__(self, rules=DEFAULT_RULES, stale_after=2.0):
+        self.abbreviations = tuple(rule.abbreviation for rule in rules)
+        self.link_alarm = next((bit for bit, rule in enumerate(rules) if rule.field == "gui_time"), None)
+        self.stale_after = stale_after
+        self.remote_mask = 0
+        self.received = None
+        self.mask = 0 if self.link_alarm is None else 1 << self.link_alarm
+        self.changed = True
+
+    def set_hello(self, info):
+        self.abbreviations = tuple(info["alarms"])
+        self.link_alarm = info.get("link_alarm")
+
+    def update(self, fields, now):
+        mask = self.remote_mask
+        if self.link_alarm is not None and (self.received is None or now - self.received > self.stale_after):
+            mask |= 1 << self.link_alarm
+        self.changed = mask != self.mask
+        self.mask = mask
+
+
+class RemoteFeed:
+    # A telemetry source for bpla.py that subscribes to another panel's FanoutServer.
+    def __init__(self, host, port, rate=None, reconnect_interval=1.0):
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.reconnect_interval = reconnect_interval
+        self.snapshot = EMPTY_SNAPSHOT
+        self.alarms = RemoteAlarms()
+        self.running = False
+        self.thread = None
+        self.sock = None
+        self.received = 0
+        self.skipped = 0
+        self.last_seq = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.worker, name="remote-telemetry", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.sock is not None:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+
+    def latest(self):
+        return self.snapshot
+
+    def worker(self):
+        while self.running:
+            try:
+                with socket.create_connection((self.host, self.port), timeout=5.0) as sock:
+                    self.sock = sock
+                    sock.settimeout(None)
+                    if self.rate is not None:
+                        sock.sendall(f"rate {self.rate}\n".encode())
+                    self.receive(sock.makefile("rb"))
+            except OSError:
+                pass
+            self.sock = None
+            if self.running:
+                time.sleep(self.reconnect_interval)
+
+    def receive(self, stream):
+        while self.running:
+            header = stream.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+            length, = FRAME_HEADER.unpack(header)
+            payload = stream.read(length)
+            if len(payload) < length:
+                return
+            if payload[0] == HELLO:
+                self.alarms.set_hello(json.loads(payload[1:].decode()))
+            elif payload[0] == SNAPSHOT:
+                seq, _, snapshot, mask = decode_snapshot(payload)
+                if self.last_seq is not None and seq > self.last_seq + 1:
+                    self.skipped += seq - self.last_seq - 1
+                self.last_seq = seq
+                self.received += 1
+                self.alarms.remote_mask = mask
+                self.alarms.received = time.monotonic()
+                self.snapshot = snapshot
+
+
+def parse_address(text, default_host="localhost"):
+    host, _, port = text.rpartition(":")
+    return host or default_host, int(port)
+
+
+async def load_client(host, port, results, rate=None, websocket=False, read=True):
+    if not read:
+        # A viewer that connects and then stops reading, with a tiny receive window.
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, (host, port))
+        results.append({"kind": "stalled", "sock": sock})
+        return
+    reader, writer = await asyncio.open_connection(host, port)
+    result = {"kind": "websocket" if websocket else "tcp", "rate": rate, "received": 0, "latencies": []}
+    results.append(result)
+    if websocket:
+        key = base64.b64encode(b"load-test-client").decode()
+        query = f"?rate={rate}" if rate else ""
+        writer.write(f"GET /{query} HTTP/1.1\r\nHost: {host}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode())
+        await reader.readuntil(b"\r\n\r\n")
+    elif rate:
+        writer.write(f"rate {rate}\n".encode())
+    try:
+        while True:
+            if websocket:
+                _, length = await reader.readexactly(2)
+                if length == 126:
+                    length, = struct.unpack("!H", await reader.readexactly(2))
+            else:
+                length, = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+            payload = await reader.readexactly(length)
+            if payload[0] == SNAPSHOT:
+                _, sent, _, _ = decode_snapshot(payload)
+                result["received"] += 1
+                result["latencies"].append(time.time() - sent)
+    except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+async def load_test(server, clients, websocket_clients, limited_clients, stalled_clients, publish_rate, seconds):
+    results = []
+    host = "127.0.0.1"
+    tasks = [asyncio.ensure_future(load_client(host, server.port, results)) for _ in range(clients)]
+    tasks += [asyncio.ensure_future(load_client(host, server.websocket_port, results, websocket=True))
+              for _ in range(websocket_clients)]
+    tasks += [asyncio.ensure_future(load_client(host, server.port, results, rate=5))
+              for _ in range(limited_clients)]
+    tasks += [asyncio.ensure_future(load_client(host, server.port, results, read=False))
+              for _ in range(stalled_clients)]
+    await asyncio.sleep(0.5)
+
+    publish_times = []
+    interval = 1.0 / publish_rate
+    started = time.monotonic()
+    frame = 0
+    while time.monotonic() - started < seconds:
+        frame += 1
+        now = time.monotonic()
+        snapshot = EMPTY_SNAPSHOT._replace(lat_deg=55.75 + frame * 1e-5, lon_deg=37.6, alt_m=300.0,
+                                           gui_time=now, airspeed=80.0, airspeed_time=now)
+        t0 = time.perf_counter()
+        server.publish(snapshot, frame & 0x3FF)
+        publish_times.append(time.perf_counter() - t0)
+        await asyncio.sleep(max(0.0, started + frame * interval - time.monotonic()))
+    await asyncio.sleep(0.2)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for result in results:
+        if "sock" in result:
+            result["sock"].close()
+    return results, publish_times, frame
+
+
+def report_load_test(results, publish_times, published, seconds, server):
+    print(f"published {published} snapshots in {seconds:.0f} s to {server.peak_subscribers} subscribers")
+    print(f"publish call: p50 {percentile(sorted(publish_times), 0.5) * 1e6:.0f} us, "
+          f"max {max(publish_times) * 1e6:.0f} us")
+    for kind in ("tcp", "websocket"):
+        for rate in (None, 5):
+            group = [r for r in results if r["kind"] == kind and r["rate"] == rate]
+            if not group:
+                continue
+            latencies = sorted(value for r in group for value in r["latencies"])
+            rates = [r["received"] / seconds for r in group]
+            print(f"{kind} clients{f' at rate {rate}' if rate else ''}: {len(group)}, "
+                  f"{min(rates):.1f}-{max(rates):.1f} msg/s each, "
+                  f"latency p50 {percentile(latencies, 0.5) * 1000:.2f} ms "
+                  f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+    stalled = sum(1 for r in results if r["kind"] == "stalled")
+    print(f"stalled clients: {stalled}, dropped as slow: {server.dropped_slow}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test of the telemetry fan-out server with local clients")
+    parser.add_argument("--clients", type=int, default=40, help="TCP clients at the full rate")
+    parser.add_argument("--websocket-clients", type=int, default=10)
+    parser.add_argument("--limited-clients", type=int, default=10, help="TCP clients asking for 5 updates/s")
+    parser.add_argument("--stalled-clients", type=int, default=3, help="clients that never read")
+    parser.add_argument("--publish-rate", type=float, default=60.0, help="snapshots per second from the panel")
+    parser.add_argument("--max-rate", type=float, default=30.0, help="server cap on updates per client per second")
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--port", type=int, default=5510)
+    parser.add_argument("--websocket-port", type=int, default=5511)
+    args = parser.parse_args()
+
+    fanout = FanoutServer("127.0.0.1", args.port, args.websocket_port, max_rate=args.max_rate)
+    fanout.start()
+    try:
+        load_results, publish_durations, count = asyncio.run(load_test(
+            fanout, args.clients, args.websocket_clients, args.limited_clients, args.stalled_clients,
+            args.publish_rate, args.seconds))
+        report_load_test(load_results, publish_durations, count, args.seconds, fanout)
+    finally:
+        fanout.stop()
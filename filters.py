@@ -0,0 +1,229 @@
+import argparse
+import inspect
+import math
+
+import numpy as np
+
+from telemetry import GUI_FIELDS
+
+# Filters run on each new telemetry sample. They keep their state in a few floats, so an update
+# is O(1) and allocates nothing.
+
+
+class EmaFilter:
+    # Exponential smoothing with a time constant rather than a per-sample weight, so the amount of
+    # smoothing doesn't depend on the sample rate.
+    def __init__(self, time_constant=0.15):
+        self.time_constant = time_constant
+        self.value = None
+        self.time = None
+
+    def update(self, timestamp, measurement):
+        if self.value is None:
+            self.value = measurement
+        else:
+            dt = timestamp - self.time
+            if dt > 0:
+                self.value += (measurement - self.value) * (1.0 - math.exp(-dt / self.time_constant))
+        self.time = timestamp
+        return self.value
+
+
+class AlphaBetaFilter:
+    # Tracks value and rate, so a steady roll doesn't lag behind the way plain smoothing does.
+    def __init__(self, alpha=0.5, beta=0.1):
+        self.alpha = alpha
+        self.beta = beta
+        self.value = None
+        self.rate = 0.0
+        self.time = None
+
+    def update(self, timestamp, measurement):
+        if self.value is None:
+            self.value = measurement
+        else:
+            dt = timestamp - self.time
+            if dt > 0:
+                predicted = self.value + self.rate * dt
+                residual = measurement - predicted
+                self.value = predicted + self.alpha * residual
+                self.rate += self.beta * residual / dt
+        self.time = timestamp
+        return self.value
+
+
+class KalmanFilter:
+    # Constant-velocity model. process_noise is the variance of the unmodelled acceleration,
+    # measurement_noise the variance of a sample; the 2x2 covariance is kept as three floats.
+    def __init__(self, process_noise=4.0, measurement_noise=1.0):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.value = None
+        self.rate = 0.0
+        self.p00 = self.p01 = self.p11 = 0.0
+        self.time = None
+
+    def update(self, timestamp, measurement):
+        if self.value is None:
+            self.value = measurement
+            self.p00 = self.measurement_noise
+            self.p11 = self.process_noise
+            self.time = timestamp
+            return self.value
+        dt = timestamp - self.time
+        if dt > 0:
+            q = self.process_noise
+            self.value += self.rate * dt
+            p00 = self.p00 + dt * (2 * self.p01 + dt * self.p11) + q * dt ** 3 / 3
+            p01 = self.p01 + dt * self.p11 + q * dt ** 2 / 2
+            p11 = self.p11 + q * dt
+        else:
+            p00, p01, p11 = self.p00, self.p01, self.p11
+        innovation = measurement - self.value
+        s = p00 + self.measurement_noise
+        k0 = p00 / s
+        k1 = p01 / s
+        self.value += k0 * innovation
+        self.rate += k1 * innovation
+        self.p00 = (1 - k0) * p00
+        self.p01 = (1 - k0) * p01
+        self.p11 = p11 - k1 * p01
+        self.time = timestamp
+        return self.value
+
+
+FILTER_KINDS = {
+    "ema": EmaFilter,
+    "alpha_beta": AlphaBetaFilter,
+    "kalman": KalmanFilter,
+}
+
+# Snapshot units: climb rate in ft/s, bank and pitch in radians.
+DEFAULT_FILTERS = {
+    "climb_rate": ("kalman", {"process_noise": 4.0, "measurement_noise": 1.0}),
+    "phi_rad": ("alpha_beta", {"alpha": 0.5, "beta": 0.1}),
+    "theta_rad": ("alpha_beta", {"alpha": 0.5, "beta": 0.1}),
+}
+
+
+def make_filter(kind, params):
+    if kind not in FILTER_KINDS:
+        raise ValueError(f"unknown filter {kind!r}, expected one of {', '.join(FILTER_KINDS)}")
+    return FILTER_KINDS[kind](**params)
+
+
+# Heading is left out: these filters aren't angle-aware and would swing it the long way round at north.
+FILTER_CHANNELS = tuple(channel for channel in GUI_FIELDS + ("airspeed",) if channel != "psi_rad")
+
+
+def parse_filter_spec(text):
+    # "climb_rate=kalman:process_noise=2,measurement_noise=0.5" or "phi_rad=none"
+    channel, _, spec = text.partition("=")
+    kind, _, params = spec.partition(":")
+    if not channel or not kind:
+        raise ValueError(f"bad filter spec {text!r}, expected CHANNEL=KIND[:NAME=VALUE,...]")
+    if channel not in FILTER_CHANNELS:
+        raise ValueError(f"cannot filter {channel!r}, expected one of {', '.join(FILTER_CHANNELS)}")
+    if kind == "none":
+        return channel, None
+    if kind not in FILTER_KINDS:
+        raise ValueError(f"unknown filter {kind!r}, expected one of {', '.join(FILTER_KINDS)}")
+    names = tuple(inspect.signature(FILTER_KINDS[kind]).parameters)
+    values = {}
+    for item in params.split(",") if params else ():
+        name, _, value = item.partition("=")
+        if name not in names:
+            raise ValueError(f"{kind} has no parameter {name!r}, expected one of {', '.join(names)}")
+        try:
+            values[name] = float(value)
+        except ValueError:
+            raise ValueError(f"{kind} parameter {name} needs a number, got {value!r}") from None
+    return channel, (kind, values)
+
+
+def filter_spec(text):
+    # For argparse type=, so a bad --filter is reported before anything starts.
+    try:
+        return parse_filter_spec(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def filter_config(specs=(), base=DEFAULT_FILTERS):
+    # specs are parsed (channel, spec) pairs, applied in order over base.
+    config = dict(base)
+    for channel, spec in specs:
+        if spec is None:
+            config.pop(channel, None)
+        else:
+            config[channel] = spec
+    return config
+
+
+class FilterStage:
+    # Sits between telemetry ingest and rendering. Only new samples advance the filters; the same
+    # sample shown again gets the same filtered snapshot back.
+    def __init__(self, config=DEFAULT_FILTERS):
+        self.config = config
+        self.filters = {channel: make_filter(kind, params) for channel, (kind, params) in config.items()}
+        self.sample = None
+        self.filtered = None
+
+    def update(self, timestamp, snapshot):
+        self.sample = snapshot
+        self.filtered = snapshot._replace(**{channel: f.update(timestamp, getattr(snapshot, channel))
+                                             for channel, f in self.filters.items()})
+        return self.filtered
+
+    def apply(self, snapshot):
+        if snapshot is self.sample:
+            return self.filtered
+        # Between new samples other fields (airspeed, props) still come through unchanged.
+        return snapshot._replace(**{channel: f.value for channel, f in self.filters.items()
+                                    if f.value is not None})
+
+
+def filter_array(kind, params, times, values):
+    # Same update code as the panel, on a fresh filter, so the output matches it sample for sample.
+    f = make_filter(kind, params)
+    update = f.update
+    out = np.empty(len(values))
+    for i, (timestamp, value) in enumerate(zip(np.asarray(times, dtype=float).tolist(),
+                                               np.asarray(values, dtype=float).tolist())):
+        out[i] = update(timestamp, value)
+    return out
+
+
+def filter_log(log, config=DEFAULT_FILTERS):
+    times = log["time"]
+    return {channel: filter_array(kind, params, times, log[channel]) for channel, (kind, params) in config.items()}
+
+
+if __name__ == '__main__':
+    import time
+
+    from recorder import FlightLog
+
+    parser = argparse.ArgumentParser(description="Apply the panel's telemetry filters to a recorded flight")
+    parser.add_argument("recording")
+    parser.add_argument("--filter", action="append", default=[], type=filter_spec,
+                        metavar="CHANNEL=KIND[:NAME=VALUE,...]",
+                        help="override a channel's filter, KIND is ema, alpha_beta, kalman or none")
+    parser.add_argument("--save", metavar="PATH", help="write the filtered channels to an .npz file")
+    args = parser.parse_args()
+
+    log = FlightLog(args.recording)
+    if not len(log):
+        parser.error(f"{args.recording} has no recorded samples")
+    config = filter_config(args.filter)
+    started = time.perf_counter()
+    filtered = filter_log(log, config)
+    elapsed = time.perf_counter() - started
+    print(f"{len(log)} samples, {len(config)} channels in {elapsed * 1000:.1f} ms")
+    for channel, values in filtered.items():
+        raw = np.asarray(log[channel])
+        # Sample-to-sample movement is what shows up as needle jitter.
+        print(f"{channel}: {config[channel][0]}, step rms {np.sqrt(np.mean(np.diff(raw) ** 2)):.4f} "
+              f"-> {np.sqrt(np.mean(np.diff(values) ** 2)):.4f}")
+    if args.save:
+        np.savez(args.save, time=np.asarray(log["time"]), **filtered)
@@ -0,0 +1,59 @@
+from collections import OrderedDict
+
+import pygame
+
+fonts = {}
+
+
+def get_font(size):
+    font = fonts.get(size)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = pygame.font.Font(None, size)
+        fonts[size] = font
+    return font
+
+
+class TextCache:
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, size, color, antialias=True):
+        key = (text, size, tuple(color), antialias)
+        text_surface = self.entries.get(key)
+        if text_surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return text_surface
+
+        self.misses += 1
+        text_surface = get_font(size).render(text, antialias, color)
+        self.entries[key] = text_surface
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return text_surface
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self.entries),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+text_cache = TextCache()
+
+
+def render_text(text, size, color, antialias=True):
+    return text_cache.render(text, size, color, antialias)
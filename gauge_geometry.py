@@ -0,0 +1,55 @@
+import math
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+TickTable = namedtuple("TickTable", ["cos", "sin", "starts", "ends", "labels", "points"])
+
+NEEDLE_COS = math.cos(math.radians(150))
+NEEDLE_SIN = math.sin(math.radians(150))
+
+
+def scale_angles(marks, start_angle, scale_range, max_value):
+    return tuple(start_angle + mark / max_value * scale_range for mark in marks)
+
+
+@lru_cache(maxsize=64)
+def tick_table(radius, inset, angles_deg, lengths, label_inset):
+    # angles_deg and lengths are tuples so the table can be cached per (radius, scale).
+    angles = np.radians(np.asarray(angles_deg, dtype=float))
+    cos = np.cos(angles)
+    sin = np.sin(angles)
+    lengths = np.asarray(lengths, dtype=float)
+    starts = np.column_stack((radius + (radius - inset) * cos, radius + (radius - inset) * sin))
+    ends = np.column_stack((radius + (radius - inset - lengths) * cos,
+                            radius + (radius - inset - lengths) * sin))
+    labels = np.column_stack((radius + (radius - label_inset) * cos, radius + (radius - label_inset) * sin))
+    # starts, ends and labels stacked, so a rotating card is transformed in one call.
+    points = np.vstack((starts, ends, labels))
+    for array in (cos, sin, starts, ends, labels, points):
+        array.flags.writeable = False
+    return TickTable(cos, sin, starts, ends, labels, points)
+
+
+def rotate_points(points, center, rad_angle):
+    # One cos/sin pair for the whole table instead of one per tick.
+    cos_a = math.cos(rad_angle)
+    sin_a = math.sin(rad_angle)
+    offsets = points - center
+    rotated = np.empty_like(offsets)
+    rotated[:, 0] = offsets[:, 0] * cos_a - offsets[:, 1] * sin_a
+    rotated[:, 1] = offsets[:, 0] * sin_a + offsets[:, 1] * cos_a
+    return rotated + center
+
+
+def needle_polygon(cx, cy, rad_angle, length, base=10):
+    cos_a = math.cos(rad_angle)
+    sin_a = math.sin(rad_angle)
+    cos_s = NEEDLE_COS
+    sin_s = NEEDLE_SIN
+    return [
+        (cx + length * cos_a, cy + length * sin_a),
+        (cx + base * (cos_a * cos_s - sin_a * sin_s), cy + base * (sin_a * cos_s + cos_a * sin_s)),
+        (cx + base * (cos_a * cos_s + sin_a * sin_s), cy + base * (sin_a * cos_s - cos_a * sin_s)),
+    ]
@@ -0,0 +1,60 @@
+import json
+import os
+
+import pygame
+
+DEFAULT_LAYOUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "panel_layout.json")
+SHAPES = ("rect", "round")
+# Drawn on every frame; the navigation readouts, map and profiler overlay are drawn only if a layout has them.
+REQUIRED_WIDGETS = ("sensors", "attitude", "heading", "speed", "vsi", "altimeter",
+                    "fuel", "clock", "rpm", "temperature", "temp_engine", "oil")
+
+
+class PanelLayout:
+    # Widget rects are fractions of the window, so one layout fits any resolution.
+    # Round gauges are shrunk to the largest square centred in their rect.
+    def __init__(self, widgets, window=(1200, 700)):
+        self.widgets = widgets
+        self.window = tuple(window)
+
+    @classmethod
+    def load(cls, path=DEFAULT_LAYOUT_PATH):
+        with open(path) as f:
+            config = json.load(f)
+        widgets = {}
+        for name, spec in config["widgets"].items():
+            rect = tuple(float(value) for value in spec["rect"])
+            shape = spec.get("shape", "rect")
+            if len(rect) != 4 or not all(0.0 <= value <= 1.0 for value in rect):
+                raise ValueError(f"{path}: widget {name} needs a rect of four fractions of the window")
+            if rect[0] + rect[2] > 1.0 or rect[1] + rect[3] > 1.0:
+                raise ValueError(f"{path}: widget {name} does not fit in the window")
+            if shape not in SHAPES:
+                raise ValueError(f"{path}: widget {name} has unknown shape {shape!r}")
+            widgets[name] = (rect, shape)
+        missing = [name for name in REQUIRED_WIDGETS if name not in widgets]
+        if missing:
+            raise ValueError(f"{path}: no rect for widget{'s' if len(missing) > 1 else ''} {', '.join(missing)}")
+        return cls(widgets, config.get("window", (1200, 700)))
+
+    def resolve(self, width, height):
+        rects = {}
+        for name, ((x, y, w, h), shape) in self.widgets.items():
+            rect = pygame.Rect(round(x * width), round(y * height), round(w * width), round(h * height))
+            if shape == "round":
+                side = min(rect.width, rect.height)
+                square = pygame.Rect(0, 0, side, side)
+                square.center = rect.center
+                rect = square
+            rects[name] = rect
+        return rects
+
+
+default_layout = None
+
+
+def get_default_layout():
+    global default_layout
+    if default_layout is None:
+        default_layout = PanelLayout.load()
+    return default_layout
@@ -0,0 +1,114 @@
+import multiprocessing as mp
+import os
+import queue
+import time
+
+from navigation import distance_m
+from track import TrackStore
+
+
+def write_map(path, track):
+    import folium
+    from folium.features import CustomIcon
+
+    latitude, longitude = track[-1]
+    m = folium.Map(location=[latitude, longitude], zoom_start=15)
+    arrow_icon = CustomIcon(
+        icon_image="https://cdn-icons-png.flaticon.com/128/635/635717.png",
+        icon_size=(40, 40),
+        icon_anchor=(20, 20),
+    )
+    folium.Marker(
+        location=[latitude, longitude],
+        popup="Текущая точка",
+        icon=arrow_icon,
+    ).add_to(m)
+    folium.PolyLine(
+        locations=track,
+        color="blue",
+        weight=3,
+        opacity=0.8,
+    ).add_to(m)
+    for point in track:
+        folium.CircleMarker(
+            location=point,
+            radius=3,
+            color="red",
+            fill=True,
+            fill_color="red",
+            fill_opacity=1.0,
+            popup=f"Точка: {point}",
+        ).add_to(m)
+
+    # Write next to the target and rename, so a browser reload never sees a half-written file.
+    tmp_path = f"{path}.tmp"
+    m.save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def map_worker(samples, path, interval_s, min_move_m, open_browser, tolerance_m, max_points):
+    track = TrackStore(tolerance_m=tolerance_m, max_points=max_points)
+    exported_at = None
+    exported_point = None
+    running = True
+    while running:
+        try:
+            sample = samples.get(timeout=interval_s)
+        except queue.Empty:
+            sample = ()
+        # Drain everything queued so far, the map only needs to be built once for the batch.
+        while sample is not None:
+            if sample:
+                track.append(*sample)
+            try:
+                sample = samples.get_nowait()
+            except queue.Empty:
+                break
+        if sample is None:
+            running = False
+        if not track:
+            continue
+
+        now = time.monotonic()
+        if running and exported_at is not None and now - exported_at < interval_s:
+            continue
+        current_point = track.last_point()
+        if exported_point is not None and distance_m(*exported_point, *current_point) < min_move_m:
+            continue
+        write_map(path, track.points())
+        if open_browser and exported_at is None:
+            import webbrowser
+            webbrowser.open(os.path.abspath(path))
+        exported_at = now
+        exported_point = current_point
+
+
+class MapExporter:
+    def __init__(self, path="helicopter_path_with_dots.html", interval_s=5.0, min_move_m=10.0,
+                 open_browser=True, tolerance_m=5.0, max_points=2000, max_queued=1024):
+        self.samples = mp.Queue(maxsize=max_queued)
+        self.process = mp.Process(
+            target=map_worker,
+            args=(self.samples, path, interval_s, min_move_m, open_browser, tolerance_m, max_points),
+            name="map-export",
+            daemon=True,
+        )
+        self.dropped = 0
+
+    def start(self):
+        self.process.start()
+
+    def submit(self, lat_deg, lon_deg):
+        try:
+            self.samples.put_nowait((lat_deg, lon_deg))
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self, timeout=5.0):
+        try:
+            self.samples.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
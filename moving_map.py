@@ -0,0 +1,262 @@
+import io
+import math
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+import pygame
+
+from track import TrackStore
+
+TILE_SIZE = 256
+MAX_LATITUDE = 85.0511287798
+MISSING_TILE_BYTES = 64
+
+
+def project(lat_deg, lon_deg, zoom):
+    # Web Mercator, in pixels of the whole world at this zoom level.
+    world = TILE_SIZE * (1 << zoom)
+    lat = math.radians(max(-MAX_LATITUDE, min(MAX_LATITUDE, lat_deg)))
+    x = (lon_deg + 180.0) / 360.0 * world
+    y = (1.0 - math.log(math.tan(lat) + 1.0 / math.cos(lat)) / math.pi) / 2.0 * world
+    return x, y
+
+
+def project_array(lats, lons, zoom):
+    world = TILE_SIZE * (1 << zoom)
+    lat = np.radians(np.clip(np.asarray(lats, dtype=float), -MAX_LATITUDE, MAX_LATITUDE))
+    x = (np.asarray(lons, dtype=float) + 180.0) / 360.0 * world
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * world
+    return np.column_stack((x, y))
+
+
+class DirectoryTileSource:
+    def __init__(self, root, pattern="{z}/{x}/{y}.png"):
+        self.root = root
+        self.pattern = pattern
+
+    def read(self, z, x, y):
+        try:
+            with open(os.path.join(self.root, self.pattern.format(z=z, x=x, y=y)), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def close(self):
+        pass
+
+
+class MBTilesSource:
+    def __init__(self, path):
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        # sqlite connections belong to the thread that made them, so the tile worker opens it.
+        self.conn = None
+
+    def read(self, z, x, y):
+        if self.conn is None:
+            self.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        # MBTiles rows count from the south (TMS), slippy map tiles from the north.
+        row = self.conn.execute(
+            "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (z, x, (1 << z) - 1 - y)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def open_tile_source(path):
+    if os.path.isdir(path):
+        return DirectoryTileSource(path)
+    return MBTilesSource(path)
+
+
+class TileCache:
+    # LRU of decoded tiles bounded by pixel memory. Tiles the store doesn't have are cached as None,
+    # so they aren't requested again every frame.
+    def __init__(self, max_bytes=64 << 20):
+        self.max_bytes = max_bytes
+        self.tiles = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self.tiles
+
+    def get(self, key):
+        if key in self.tiles:
+            self.tiles.move_to_end(key)
+            self.hits += 1
+            return self.tiles[key]
+        self.misses += 1
+        return None
+
+    @staticmethod
+    def tile_bytes(tile):
+        return tile.get_pitch() * tile.get_height() if tile is not None else MISSING_TILE_BYTES
+
+    def put(self, key, tile):
+        if key in self.tiles:
+            self.bytes -= self.tile_bytes(self.tiles.pop(key))
+        self.tiles[key] = tile
+        self.bytes += self.tile_bytes(tile)
+        while self.bytes > self.max_bytes and len(self.tiles) > 1:
+            _, evicted = self.tiles.popitem(last=False)
+            self.bytes -= self.tile_bytes(evicted)
+
+
+class MovingMap:
+    def __init__(self, source, zoom=15, max_bytes=64 << 20, prefetch_radius=1, lookahead=2,
+                 tolerance_m=2.0, max_points=2000):
+        self.source = source
+        self.zoom = zoom
+        self.tiles_per_side = 1 << zoom
+        self.prefetch_radius = prefetch_radius
+        self.lookahead = lookahead
+        self.cache = TileCache(max_bytes)
+        self.track = TrackStore(tolerance_m=tolerance_m, max_points=max_points)
+        self.requests = queue.Queue()
+        self.decoded = deque()
+        self.pending = set()
+        self.wanted = frozenset()
+        self.request_key = None
+        self.tiles_loaded = 0
+        self.track_pixels = np.zeros((0, 2))
+        self.track_key = None
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.worker, name="map-tiles", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.requests.put(None)
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def worker(self):
+        while True:
+            key = self.requests.get()
+            if key is None:
+                break
+            # The vehicle may have moved on since this was queued.
+            if key not in self.wanted:
+                self.decoded.append((key, None, True))
+                continue
+            z, x, y = key
+            tile = None
+            data = self.source.read(z, x, y)
+            if data is not None:
+                try:
+                    tile = pygame.image.load(io.BytesIO(data))
+                except pygame.error:
+                    tile = None
+            self.decoded.append((key, tile, False))
+        self.source.close()
+
+    def collect(self):
+        # Hand decoded tiles over to the render thread's cache; no I/O happens here.
+        converted = pygame.display.get_surface() is not None
+        while self.decoded:
+            key, tile, skipped = self.decoded.popleft()
+            self.pending.discard(key)
+            if skipped:
+                continue
+            if tile is not None and converted:
+                tile = tile.convert()
+            self.cache.put(key, tile)
+            self.tiles_loaded += 1
+
+    def add_track_point(self, lat_deg, lon_deg):
+        self.track.append(lat_deg, lon_deg)
+
+    def request_tiles(self, cx, cy, heading_rad, width, height):
+        first_x = math.floor((cx - width / 2) / TILE_SIZE)
+        last_x = math.floor((cx + width / 2) / TILE_SIZE)
+        first_y = math.floor((cy - height / 2) / TILE_SIZE)
+        last_y = math.floor((cy + height / 2) / TILE_SIZE)
+        step_x = round(math.sin(heading_rad))
+        step_y = -round(math.cos(heading_rad))
+        key = (first_x, last_x, first_y, last_y, step_x, step_y)
+        if key == self.request_key:
+            return
+        self.request_key = key
+
+        radius = self.prefetch_radius
+        wanted = {(tx, ty) for tx in range(first_x - radius, last_x + radius + 1)
+                  for ty in range(first_y - radius, last_y + radius + 1)}
+        # Tiles ahead of the vehicle along its heading, so they are ready before they scroll in.
+        for k in range(1, self.lookahead + 1):
+            for tx in range(first_x + k * step_x, last_x + k * step_x + 1):
+                for ty in range(first_y + k * step_y, last_y + k * step_y + 1):
+                    wanted.add((tx, ty))
+        center_x = cx / TILE_SIZE
+        center_y = cy / TILE_SIZE
+        keys = sorted(((self.zoom, tx % self.tiles_per_side, ty) for tx, ty in wanted
+                       if 0 <= ty < self.tiles_per_side),
+                      key=lambda k: (k[1] + 0.5 - center_x) ** 2 + (k[2] + 0.5 - center_y) ** 2)
+        self.wanted = frozenset(keys)
+        for tile_key in keys:
+            if tile_key not in self.cache and tile_key not in self.pending:
+                self.pending.add(tile_key)
+                self.requests.put(tile_key)
+
+    def projected_track(self):
+        track = self.track
+        key = (id(track.lat), len(track.lat))
+        if key != self.track_key:
+            self.track_pixels = project_array(track.lat, track.lon, self.zoom)
+            self.track_key = key
+        return self.track_pixels
+
+    def state(self, lat_deg, lon_deg, heading_rad):
+        self.collect()
+        cx, cy = project(lat_deg, lon_deg, self.zoom)
+        return round(cx), round(cy), round(heading_rad, 2), self.tiles_loaded, self.track.samples
+
+    def draw(self, surface, x, y, width, height, lat_deg, lon_deg, heading_rad, colors):
+        cx, cy = project(lat_deg, lon_deg, self.zoom)
+        self.request_tiles(cx, cy, heading_rad, width, height)
+        left = cx - width / 2
+        top = cy - height / 2
+
+        clip = surface.get_clip()
+        surface.set_clip((x, y, width, height))
+        surface.fill(colors["map_background"], (x, y, width, height))
+        for tx in range(math.floor(left / TILE_SIZE), math.floor((left + width) / TILE_SIZE) + 1):
+            for ty in range(math.floor(top / TILE_SIZE), math.floor((top + height) / TILE_SIZE) + 1):
+                if not 0 <= ty < self.tiles_per_side:
+                    continue
+                tile = self.cache.get((self.zoom, tx % self.tiles_per_side, ty))
+                if tile is not None:
+                    surface.blit(tile, (x + round(tx * TILE_SIZE - left), y + round(ty * TILE_SIZE - top)))
+
+        points = self.projected_track()
+        last = self.track.last_point()
+        if last is not None and len(points) and tuple(last) != (self.track.lat[-1], self.track.lon[-1]):
+            points = np.vstack((points, project(*last, self.zoom)))
+        if len(points) > 1:
+            offset = np.array((x - left, y - top))
+            pygame.draw.lines(surface, colors["map_track"], False, (points + offset).tolist(), 2)
+
+        size = max(6, min(width, height) // 20)
+        sin_h = math.sin(heading_rad)
+        cos_h = math.cos(heading_rad)
+        center_x = x + width / 2
+        center_y = y + height / 2
+        arrow = [(0, -1.6), (0.9, 1.0), (0, 0.4), (-0.9, 1.0)]
+        pygame.draw.polygon(surface, colors["yellow"], [
+            (center_x + size * (px * cos_h - py * sin_h), center_y + size * (px * sin_h + py * cos_h))
+            for px, py in arrow
+        ])
+        pygame.draw.rect(surface, colors["white"], (x, y, width, height), 2)
+        surface.set_clip(clip)
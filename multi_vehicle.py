@@ -0,0 +1,262 @@
+import argparse
+import json
+import math
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pygame
+from pygame.locals import *
+
+import bpla
+from alarms import AlarmEngine
+from fonts import render_text
+from telemetry import EMPTY_SNAPSHOT, GUI_FIELDS, TelemetryFeed
+
+READOUTS = ("fuel_level", "engine_rpm", "temp", "t_eng", "oil")
+SLOT_FIELDS = ("seq", "samples", "gui_time", "airspeed", "airspeed_time") + GUI_FIELDS + READOUTS
+SLOT_INDEX = {name: i for i, name in enumerate(SLOT_FIELDS)}
+GUI_START = SLOT_INDEX[GUI_FIELDS[0]]
+READOUTS_START = SLOT_INDEX[READOUTS[0]]
+PANEL_SIZE = (1200, 700)
+MAX_READ_RETRIES = 1000
+
+
+def slot_value(value):
+    # Property values arrive as whatever the telnet reply parsed to; anything that isn't a number
+    # becomes NaN here, before the row is marked as being written.
+    if value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class VehicleSlots:
+    # One row of float64 per vehicle in a shared memory block. Each row is guarded by a
+    # sequence counter: odd while the ingest process is writing, even when consistent.
+    def __init__(self, vehicles, name=None):
+        create = name is None
+        size = max(1, vehicles) * len(SLOT_FIELDS) * 8
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        self.rows = np.ndarray((vehicles, len(SLOT_FIELDS)), dtype=np.float64, buffer=self.shm.buf)
+        if create:
+            self.rows[:] = 0.0
+            self.rows[:, READOUTS_START:] = math.nan
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, vehicle, snapshot, samples):
+        # Everything that can fail is converted first, so the row is never left odd by an exception.
+        values = [float(samples),
+                  snapshot.gui_time if snapshot.gui_time is not None else 0.0,
+                  slot_value(snapshot.airspeed),
+                  snapshot.airspeed_time if snapshot.airspeed_time is not None else 0.0]
+        values += [slot_value(value) for value in snapshot[:len(GUI_FIELDS)]]
+        values += [slot_value(snapshot.props.get(bpla.PANEL_PROPERTIES[name][0])) for name in READOUTS]
+        row = self.rows[vehicle]
+        seq = row[0]
+        row[0] = seq + 1
+        row[1:] = values
+        row[0] = seq + 2
+
+    def read(self, vehicle, max_retries=MAX_READ_RETRIES):
+        # None when no consistent copy could be taken, e.g. the ingest process died mid-write.
+        row = self.rows[vehicle]
+        for _ in range(max_retries):
+            seq = row[0]
+            if seq % 2:
+                continue
+            values = row.tolist()
+            if row[0] == seq:
+                return values
+        return None
+
+    def close(self, unlink=False):
+        del self.rows
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def values_to_snapshot(values):
+    props = {}
+    for i, name in enumerate(READOUTS):
+        value = values[READOUTS_START + i]
+        if not math.isnan(value):
+            props[bpla.PANEL_PROPERTIES[name][0]] = value
+    return EMPTY_SNAPSHOT._replace(airspeed=values[SLOT_INDEX["airspeed"]],
+                                   gui_time=values[SLOT_INDEX["gui_time"]] or None,
+                                   airspeed_time=values[SLOT_INDEX["airspeed_time"]] or None, props=props,
+                                   **dict(zip(GUI_FIELDS, values[GUI_START:GUI_START + len(GUI_FIELDS)])))
+
+
+def ingest_vehicle(vehicle, config, slots_name, vehicles, stop_event):
+    from functools import partial
+    from flightgear_python.fg_if import GuiConnection
+    from props import BatchTelnetConnection, PropertyPoller
+    from shm_ring import ShmRing
+
+    slots = VehicleSlots(vehicles, name=slots_name)
+    host = config.get("host", "localhost")
+    gui_ring = ShmRing()
+    gui_conn = GuiConnection()
+    gui_event_pipe = gui_conn.connect_rx(host, config["gui_port"], partial(bpla.gui_ring_callback, gui_ring.name))
+    gui_conn.start()
+    telnet_conn = BatchTelnetConnection(host, config["telnet_port"])
+    telnet_conn.connect()
+    poller = PropertyPoller(telnet_conn, {path: rate for path, rate in bpla.PANEL_PROPERTIES.values()})
+    feed = TelemetryFeed(gui_event_pipe, poller, airspeed_prop=bpla.PANEL_PROPERTIES["airspeed"][0],
+                         gui_ring=gui_ring)
+    feed.start()
+
+    last = None
+    while not stop_event.is_set():
+        snapshot = feed.latest()
+        if snapshot is not last:
+            slots.write(vehicle, snapshot, feed.gui_samples)
+            last = snapshot
+        time.sleep(0.002)
+    feed.stop()
+    gui_conn.stop()
+    gui_ring.close(unlink=True)
+    slots.close()
+
+
+class VehicleStats:
+    def __init__(self, window_s=2.0):
+        self.window_s = window_s
+        self.mark_time = time.monotonic()
+        self.mark_samples = 0.0
+        self.rate = 0.0
+
+    def update(self, samples, now):
+        if now - self.mark_time >= self.window_s:
+            self.rate = (samples - self.mark_samples) / (now - self.mark_time)
+            self.mark_time = now
+            self.mark_samples = samples
+
+
+def draw_status(surface, name, stats, staleness, rect, active):
+    color = bpla.COLORS["yellow"] if active else bpla.COLORS["white"]
+    if staleness is None:
+        status = f"{name}: нет данных"
+    else:
+        status = f"{name}: {stats.rate:.0f} Гц, задержка {staleness * 1000:.0f} мс"
+    text = render_text(status, 20, color)
+    surface.blit(text, (rect.x + 6, rect.y + 4))
+
+
+def tile_rects(count, width, height):
+    columns = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / columns)
+    tile_width = width // columns
+    tile_height = height // rows
+    return [pygame.Rect((i % columns) * tile_width, (i // columns) * tile_height, tile_width, tile_height)
+            for i in range(count)]
+
+
+def run(vehicles, fps=30):
+    slots = VehicleSlots(len(vehicles))
+    stop_event = mp.Event()
+    processes = [
+        mp.Process(target=ingest_vehicle, args=(i, config, slots.name, len(vehicles), stop_event),
+                   name=f"ingest-{config['name']}", daemon=True)
+        for i, config in enumerate(vehicles)
+    ]
+    for process in processes:
+        process.start()
+
+    screen = bpla.open_display(PANEL_SIZE, caption="Ground station")
+    clock = pygame.time.Clock()
+    panels = [bpla.PanelRenderer(pygame.Surface(PANEL_SIZE)) for _ in vehicles]
+    stats = [VehicleStats() for _ in vehicles]
+    alarms = [AlarmEngine() for _ in vehicles]
+    rendered_mask = [None] * len(vehicles)
+    rendered_seq = [None] * len(vehicles)
+    # The last consistent copy of each row; a row that can't be read keeps it, so its link alarm
+    # lights up as gui_time ages instead of the whole station hanging.
+    last_values = [[0.0] * len(SLOT_FIELDS) for _ in vehicles]
+    for values in last_values:
+        values[READOUTS_START:] = [math.nan] * len(READOUTS)
+    stuck = [False] * len(vehicles)
+    tiled = True
+    active = 0
+
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                running = False
+            elif event.type == VIDEORESIZE:
+                screen = pygame.display.get_surface()
+            elif event.type == KEYDOWN:
+                if event.key == K_TAB:
+                    tiled = not tiled
+                elif K_1 <= event.key <= K_9 and event.key - K_1 < len(vehicles):
+                    active = event.key - K_1
+                    tiled = False
+
+        now = time.monotonic()
+        screen.fill(bpla.COLORS["background"])
+        shown = range(len(vehicles)) if tiled else [active]
+        rects = tile_rects(len(vehicles), *screen.get_size()) if tiled else [screen.get_rect()]
+        for rect, vehicle in zip(rects, shown):
+            values = slots.read(vehicle)
+            stuck[vehicle] = values is None
+            if values is None:
+                values = last_values[vehicle]
+            last_values[vehicle] = values
+            stats[vehicle].update(values[1], now)
+            panel = panels[vehicle]
+            # Panels are laid out at the tile size, not scaled down from a full-size render.
+            if panel.surface.get_size() != rect.size:
+                panel.set_surface(pygame.Surface(rect.size))
+                rendered_seq[vehicle] = None
+            snapshot = values_to_snapshot(values)
+            mask = alarms[vehicle].update(bpla.alarm_fields(snapshot), now)
+            # A vehicle's panel is only redrawn when its own ingest process published something new
+            # or one of its alarms changed state, e.g. the link went stale.
+            if values[0] != rendered_seq[vehicle] or mask != rendered_mask[vehicle]:
+                bpla.draw_panel(panel, snapshot, alarms[vehicle])
+                rendered_seq[vehicle] = values[0]
+                rendered_mask[vehicle] = mask
+            screen.blit(panel.surface, rect)
+            gui_time = values[SLOT_INDEX["gui_time"]]
+            staleness = now - gui_time if gui_time and not stuck[vehicle] else None
+            draw_status(screen, vehicles[vehicle]["name"], stats[vehicle], staleness, rect, vehicle == active)
+        pygame.display.flip()
+        clock.tick(fps)
+
+    stop_event.set()
+    for process in processes:
+        process.join(timeout=2.0)
+        if process.is_alive():
+            process.kill()
+    slots.close(unlink=True)
+    pygame.quit()
+
+
+def parse_vehicle(spec):
+    name, gui_port, telnet_port = spec.split(":")
+    return {"name": name, "gui_port": int(gui_port), "telnet_port": int(telnet_port)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ground station panel for several vehicles")
+    parser.add_argument("--config", help="JSON list of vehicles with name, host, gui_port and telnet_port")
+    parser.add_argument("--vehicle", action="append", default=[], metavar="NAME:GUI_PORT:TELNET_PORT")
+    parser.add_argument("--fps", type=int, default=30)
+    args = parser.parse_args()
+
+    vehicles = [parse_vehicle(spec) for spec in args.vehicle]
+    if args.config:
+        with open(args.config) as f:
+            vehicles = json.load(f) + vehicles
+    if not vehicles:
+        parser.error("no vehicles configured, use --config or --vehicle")
+    run(vehicles, fps=args.fps)
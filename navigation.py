@@ -0,0 +1,191 @@
+import argparse
+import math
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bearing_deg(lat1, lon1, lat2, lon2):
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_lambda = math.radians(lon2 - lon1)
+    y = math.sin(d_lambda) * math.cos(phi2)
+    x = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(d_lambda)
+    return math.degrees(math.atan2(y, x)) % 360.0
+
+
+def cross_track(lat, lon, lat1, lon1, lat2, lon2):
+    # Signed distance from the great circle through the leg (positive to the right of it) and
+    # distance along the leg from its start, both in meters.
+    d13 = distance_m(lat1, lon1, lat, lon) / EARTH_RADIUS_M
+    theta13 = math.radians(bearing_deg(lat1, lon1, lat, lon))
+    theta12 = math.radians(bearing_deg(lat1, lon1, lat2, lon2))
+    xt = math.asin(max(-1.0, min(1.0, math.sin(d13) * math.sin(theta13 - theta12))))
+    at = math.acos(max(-1.0, min(1.0, math.cos(d13) / math.cos(xt))))
+    if math.cos(theta13 - theta12) < 0:
+        at = -at
+    return xt * EARTH_RADIUS_M, at * EARTH_RADIUS_M
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    # Array version of distance_m; arguments broadcast, so one point against a whole track works too.
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    a = (np.sin((phi2 - phi1) * 0.5) ** 2
+         + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(np.subtract(lon2, lon1)) * 0.5) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def bearings_deg(lat1, lon1, lat2, lon2):
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    d_lambda = np.radians(np.subtract(lon2, lon1))
+    cos_phi2 = np.cos(phi2)
+    y = np.sin(d_lambda) * cos_phi2
+    x = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * cos_phi2 * np.cos(d_lambda)
+    return np.degrees(np.arctan2(y, x)) % 360.0
+
+
+def cross_track_m(lats, lons, lat1, lon1, lat2, lon2):
+    d13 = haversine_m(lat1, lon1, lats, lons) / EARTH_RADIUS_M
+    delta = np.radians(bearings_deg(lat1, lon1, lats, lons) - bearing_deg(lat1, lon1, lat2, lon2))
+    xt = np.arcsin(np.clip(np.sin(d13) * np.sin(delta), -1.0, 1.0))
+    at = np.arccos(np.clip(np.cos(d13) / np.cos(xt), -1.0, 1.0))
+    return xt * EARTH_RADIUS_M, np.where(np.cos(delta) < 0, -at, at) * EARTH_RADIUS_M
+
+
+def segment_distances_m(lats, lons):
+    # Neighbouring segments share a point, so radians and cosines are taken once per point, not per pair.
+    phi = np.radians(np.asarray(lats, dtype=float))
+    lam = np.radians(np.asarray(lons, dtype=float))
+    cos_phi = np.cos(phi)
+    a = np.sin(np.diff(phi) * 0.5) ** 2 + cos_phi[:-1] * cos_phi[1:] * np.sin(np.diff(lam) * 0.5) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def ground_speeds_mps(times, lats, lons):
+    times = np.asarray(times, dtype=float)
+    dt = np.diff(times)
+    distances = segment_distances_m(lats, lons)
+    speeds = np.zeros_like(distances)
+    moving = dt > 0
+    speeds[moving] = distances[moving] / dt[moving]
+    return speeds
+
+
+def track_stats(times, lats, lons):
+    times = np.asarray(times, dtype=float)
+    if len(times) < 2:
+        return {"samples": len(times), "distance_m": 0.0, "duration_s": 0.0, "mean_ground_speed_mps": 0.0,
+                "max_ground_speed_mps": 0.0, "start_to_end_m": 0.0, "start_to_end_bearing_deg": 0.0}
+    distances = segment_distances_m(lats, lons)
+    dt = np.diff(times)
+    moving = dt > 0
+    duration = float(times[-1] - times[0])
+    distance = float(distances.sum())
+    return {
+        "samples": len(times),
+        "distance_m": distance,
+        "duration_s": duration,
+        "mean_ground_speed_mps": distance / duration if duration > 0 else 0.0,
+        "max_ground_speed_mps": float((distances[moving] / dt[moving]).max()) if moving.any() else 0.0,
+        "start_to_end_m": distance_m(lats[0], lons[0], lats[-1], lons[-1]),
+        "start_to_end_bearing_deg": bearing_deg(lats[0], lons[0], lats[-1], lons[-1]),
+    }
+
+
+def flight_stats(log, waypoint=None):
+    lats = np.asarray(log["lat_deg"])
+    lons = np.asarray(log["lon_deg"])
+    # Samples taken before the first position fix sit at 0,0 and would add a trip across the globe.
+    fixed = (lats != 0) | (lons != 0)
+    lats = lats[fixed]
+    lons = lons[fixed]
+    stats = track_stats(np.asarray(log["time"])[fixed], lats, lons)
+    if waypoint is not None and len(lats):
+        to_waypoint = haversine_m(lats, lons, *waypoint)
+        xt, _ = cross_track_m(lats, lons, lats[0], lons[0], *waypoint)
+        stats["closest_to_waypoint_m"] = float(to_waypoint.min())
+        stats["max_cross_track_m"] = float(np.abs(xt).max())
+    return stats
+
+
+class LiveNavigation:
+    # O(1) per sample. Distance and ground speed advance only once at least min_interval seconds
+    # have passed since the last step, so GUI-rate jitter in lat/lon doesn't add up as distance.
+    # Time running backwards or jumping ahead by more than max_gap (a replay seek) restarts the
+    # step from the new position rather than counting the chord across the jump.
+    def __init__(self, waypoint=None, min_interval=0.5, max_gap=2.0):
+        self.min_interval = min_interval
+        self.max_gap = max_gap
+        self.waypoint = waypoint
+        self.leg_start = None
+        self.anchor = None
+        self.position = None
+        self.distance_m = 0.0
+        self.ground_speed_mps = 0.0
+        self.max_ground_speed_mps = 0.0
+        self.samples = 0
+
+    def set_waypoint(self, lat_deg, lon_deg):
+        self.waypoint = (lat_deg, lon_deg)
+        self.leg_start = self.position
+
+    def reset_anchor(self):
+        self.anchor = None
+
+    def update(self, timestamp, lat_deg, lon_deg):
+        if lat_deg == 0 and lon_deg == 0:
+            return
+        self.samples += 1
+        self.position = (lat_deg, lon_deg)
+        if self.waypoint is not None and self.leg_start is None:
+            self.leg_start = self.position
+        if self.anchor is None:
+            self.anchor = (timestamp, lat_deg, lon_deg)
+            return
+        anchor_time, anchor_lat, anchor_lon = self.anchor
+        dt = timestamp - anchor_time
+        if dt < 0 or dt > self.max_gap:
+            self.anchor = (timestamp, lat_deg, lon_deg)
+            return
+        if dt < self.min_interval:
+            return
+        step = distance_m(anchor_lat, anchor_lon, lat_deg, lon_deg)
+        self.distance_m += step
+        self.ground_speed_mps = step / dt
+        self.max_ground_speed_mps = max(self.max_ground_speed_mps, self.ground_speed_mps)
+        self.anchor = (timestamp, lat_deg, lon_deg)
+
+    def to_waypoint(self):
+        if self.waypoint is None or self.position is None:
+            return None
+        return distance_m(*self.position, *self.waypoint), bearing_deg(*self.position, *self.waypoint)
+
+    def cross_track_m(self):
+        if self.waypoint is None or self.position is None or self.leg_start in (None, self.waypoint):
+            return None
+        return cross_track(*self.position, *self.leg_start, *self.waypoint)[0]
+
+
+if __name__ == '__main__':
+    from recorder import FlightLog
+
+    parser = argparse.ArgumentParser(description="Distance and speed statistics of a recorded flight")
+    parser.add_argument("recording")
+    parser.add_argument("--waypoint", metavar="LAT,LON", help="also report approach and cross-track error")
+    args = parser.parse_args()
+
+    waypoint = tuple(float(value) for value in args.waypoint.split(",")) if args.waypoint else None
+    for name, value in flight_stats(FlightLog(args.recording), waypoint).items():
+        print(f"{name}: {value:.1f}" if isinstance(value, float) else f"{name}: {value}")
@@ -0,0 +1,97 @@
+import math
+
+from telemetry import EMPTY_SNAPSHOT
+
+INTERPOLATED_FIELDS = ("alt_m", "agl_m", "phi_rad", "theta_rad", "psi_rad")
+ANGLE_FIELDS = ("phi_rad", "theta_rad", "psi_rad")
+
+
+def lerp(a, b, fraction):
+    return a + (b - a) * fraction
+
+
+def lerp_angle(a, b, fraction):
+    # Go the short way round, so a heading crossing north doesn't sweep back through south.
+    delta = (b - a + math.pi) % (2 * math.pi) - math.pi
+    return a + delta * fraction
+
+
+class SampleChannel:
+    # The last two timestamped samples of a group of fields that arrive together.
+    def __init__(self, fields, angles=(), max_interval=0.5):
+        self.fields = fields
+        self.angles = tuple(field in angles for field in fields)
+        self.max_interval = max_interval
+        self.prev_time = self.time = None
+        self.prev_values = self.values = None
+        self.interval = None
+
+    def push(self, timestamp, values):
+        if timestamp is None or timestamp == self.time:
+            return False
+        if self.time is not None:
+            interval = timestamp - self.time
+            # Gaps in the stream say nothing about the sample rate.
+            if 0 < interval < self.max_interval:
+                self.interval = interval if self.interval is None else self.interval * 0.9 + interval * 0.1
+        changed = values != self.values
+        self.prev_time, self.prev_values = self.time, self.values
+        self.time, self.values = timestamp, values
+        return changed
+
+    def at(self, timestamp, max_extrapolation):
+        if self.prev_values is None:
+            return self.values
+        span = self.time - self.prev_time
+        # Past the extrapolation window the stream has stalled, show the last real sample.
+        if span <= 0 or span > self.max_interval or timestamp - self.time > max_extrapolation:
+            return self.values
+        fraction = max(0.0, (timestamp - self.prev_time) / span)
+        return tuple(lerp_angle(a, b, fraction) if angle else lerp(a, b, fraction)
+                     for a, b, angle in zip(self.prev_values, self.values, self.angles))
+
+
+class SnapshotInterpolator:
+    # Renders one sample interval behind the newest sample, so the needles move between two real
+    # samples. When a sample is late the motion is extrapolated for at most max_extrapolation seconds.
+    def __init__(self, max_extrapolation=0.1, max_delay=0.1):
+        self.max_extrapolation = max_extrapolation
+        self.max_delay = max_delay
+        self.gui = SampleChannel(INTERPOLATED_FIELDS, ANGLE_FIELDS)
+        self.airspeed = SampleChannel(("airspeed",))
+        self.snapshot = EMPTY_SNAPSHOT
+        self.last_change = -math.inf
+
+    def push(self, snapshot, wall_time):
+        changed = self.gui.push(snapshot.gui_time, tuple(getattr(snapshot, field) for field in INTERPOLATED_FIELDS))
+        changed = self.airspeed.push(snapshot.airspeed_time, (snapshot.airspeed,)) or changed
+        if changed:
+            self.last_change = wall_time
+        self.snapshot = snapshot
+
+    def delay(self, channel):
+        return min(channel.interval or 0.0, self.max_delay)
+
+    def at(self, now):
+        fields = {}
+        if self.gui.values is not None:
+            fields.update(zip(INTERPOLATED_FIELDS, self.gui.at(now - self.delay(self.gui), self.max_extrapolation)))
+        if self.airspeed.values is not None:
+            fields["airspeed"] = self.airspeed.at(now - self.delay(self.airspeed), self.max_extrapolation)[0]
+        return self.snapshot._replace(**fields)
+
+
+class FramePacer:
+    def __init__(self, active_fps, idle_fps=5, idle_after=0.5):
+        self.active_fps = active_fps
+        self.idle_fps = idle_fps
+        self.idle_after = idle_after
+        self.active_frames = 0
+        self.idle_frames = 0
+
+    def fps(self, interpolator, wall_time):
+        if wall_time - interpolator.last_change < self.idle_after:
+            self.active_frames += 1
+            return self.active_fps
+        self.idle_frames += 1
+        return self.idle_fps
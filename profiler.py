@@ -0,0 +1,96 @@
+import csv
+import math
+from array import array
+from time import perf_counter
+
+
+def percentile(ordered, fraction):
+    # Nearest rank over already sorted values; every timing report uses this one rule.
+    return ordered[round((len(ordered) - 1) * fraction)] if ordered else math.nan
+
+
+class StageTimes:
+    def __init__(self, window):
+        self.samples = array("d", bytes(8 * window))
+        self.count = 0
+
+    def add(self, seconds):
+        self.samples[self.count % len(self.samples)] = seconds
+        self.count += 1
+
+    def values(self):
+        return self.samples[:min(self.count, len(self.samples))]
+
+    def summary(self):
+        values = sorted(self.values())
+        if not values:
+            return 0, 0.0, 0.0, 0.0, 0.0
+        return (self.count, sum(values) / len(values), percentile(values, 0.5), percentile(values, 0.99),
+                values[-1])
+
+
+class Profiler:
+    # Stage timings go into fixed-size ring buffers, so a long session costs no more memory than a
+    # short one. Every hook starts with a check of enabled, which is all it costs when profiling is off.
+    def __init__(self, window=600, histogram_bin_ms=1.0, histogram_bins=50, enabled=False):
+        self.window = window
+        self.histogram_bin_ms = histogram_bin_ms
+        self.enabled = enabled
+        self.stages = {}
+        self.histogram = [0] * (histogram_bins + 1)
+        self.frame_start = self.last_mark = perf_counter()
+
+    def stage(self, name):
+        times = self.stages.get(name)
+        if times is None:
+            times = self.stages[name] = StageTimes(self.window)
+        return times
+
+    def add(self, name, seconds):
+        self.stage(name).add(seconds)
+
+    def enable(self):
+        # The timestamps are stale while profiling is off; left as they are, the first mark and
+        # end_frame would record everything since then as one sample.
+        if not self.enabled:
+            self.frame_start = self.last_mark = perf_counter()
+            self.enabled = True
+
+    def start_frame(self):
+        if self.enabled:
+            self.frame_start = self.last_mark = perf_counter()
+
+    def mark(self, name):
+        if self.enabled:
+            now = perf_counter()
+            self.stage(name).add(now - self.last_mark)
+            self.last_mark = now
+
+    def end_frame(self):
+        if self.enabled:
+            elapsed = perf_counter() - self.frame_start
+            self.stage("frame").add(elapsed)
+            self.histogram[min(int(elapsed * 1000 / self.histogram_bin_ms), len(self.histogram) - 1)] += 1
+
+    def summary(self):
+        return [(name,) + times.summary() for name, times in self.stages.items()]
+
+    def reset(self):
+        self.stages.clear()
+        self.histogram = [0] * len(self.histogram)
+
+    def dump_csv(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stage", "metric", "value"])
+            for name, count, mean, p50, p99, worst in self.summary():
+                writer.writerow([name, "count", count])
+                writer.writerow([name, "mean_ms", f"{mean * 1000:.4f}"])
+                writer.writerow([name, "p50_ms", f"{p50 * 1000:.4f}"])
+                writer.writerow([name, "p99_ms", f"{p99 * 1000:.4f}"])
+                writer.writerow([name, "max_ms", f"{worst * 1000:.4f}"])
+            last = len(self.histogram) - 1
+            for i, count in enumerate(self.histogram):
+                low = i * self.histogram_bin_ms
+                label = f"{low:g}+ms" if i == last else f"{low:g}-{low + self.histogram_bin_ms:g}ms"
+                writer.writerow(["frame_histogram", label, count])
@@ -0,0 +1,120 @@
+import socket
+import time
+
+from flightgear_python.fg_if import TelnetConnection, FGConnectionError, FGCommunicationError
+
+
+def reply_matches(key_str, prop_str):
+    # FG answers with the full path or just the node name, depending on the command and version.
+    return key_str == prop_str or key_str == prop_str.rsplit('/', 1)[-1]
+
+
+class BatchTelnetConnection(TelnetConnection):
+    # Set when replies to an earlier batch may still be on their way, e.g. after a timeout.
+    out_of_sync = False
+
+    def reconnect(self):
+        # Late replies belong to a batch nobody is waiting for; a fresh connection drops them all.
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.connect()
+        self.out_of_sync = False
+
+    def get_props(self, prop_strs, buflen=4096):
+        prop_strs = [self.check_and_normalize_prop_path(prop_str) for prop_str in prop_strs]
+        if not prop_strs:
+            return {}
+        if self.out_of_sync:
+            self.reconnect()
+        # Pipeline all requests in one write; FG answers them in order, each followed by a prompt.
+        request = b''.join(self._telnet_str(f'get {prop_str}') for prop_str in prop_strs)
+        try:
+            self.sock.sendall(request)
+        except BrokenPipeError as e:
+            raise FGCommunicationError('Failed to send data. Did you call .connect()?') from e
+
+        ending_bytes = b'/> '
+        resp_bytes = b''
+        while resp_bytes.count(ending_bytes) < len(prop_strs):
+            try:
+                chunk = self.sock.recv(buflen)
+            except socket.timeout as e:
+                self.out_of_sync = True
+                raise FGConnectionError(f'Timeout waiting for data, waited {self.rx_timeout_s} seconds') from e
+            if not chunk:
+                self.out_of_sync = True
+                raise FGConnectionError('FlightGear closed the telnet connection')
+            resp_bytes += chunk
+
+        values = {}
+        responses = resp_bytes.split(ending_bytes)[:len(prop_strs)]
+        for prop_str, resp in zip(prop_strs, responses):
+            resp_str = resp.decode().strip('\r\n')
+            try:
+                key_str, value_str, type_str = self._telnet_resp_to_val(resp_str)
+            except FGCommunicationError:
+                values[prop_str] = None
+                continue
+            if not reply_matches(key_str, prop_str):
+                # Replies are matched to requests by position, so one stray reply shifts all of them.
+                self.out_of_sync = True
+                raise FGCommunicationError(f'Got a reply for {key_str} where {prop_str} was asked for')
+            values[prop_str] = self._auto_convert_fg_prop(value_str, type_str)
+        return values
+
+
+class PropertyPoller:
+    def __init__(self, telnet_conn, rates, ttl_factor=3.0):
+        self.telnet_conn = telnet_conn
+        self.rates = dict(rates)
+        self.ttl_factor = ttl_factor
+        self.values = {}
+        self.timestamps = {}
+        self.next_due = {prop_str: 0.0 for prop_str in self.rates}
+        self.requests = 0
+        self.props_fetched = 0
+
+    def poll(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        due = [prop_str for prop_str, due_time in self.next_due.items() if due_time <= now]
+        if not due:
+            return 0
+        values = self.telnet_conn.get_props(due)
+        fetched_at = time.monotonic()
+        for prop_str in due:
+            self.next_due[prop_str] = now + 1.0 / self.rates[prop_str]
+            value = values.get(prop_str)
+            if value is not None:
+                self.values[prop_str] = value
+                self.timestamps[prop_str] = fetched_at
+        self.requests += 1
+        self.props_fetched += len(due)
+        return len(due)
+
+    def time_to_next(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        return max(0.0, min(self.next_due.values(), default=now + 1.0) - now)
+
+    def get(self, prop_str, default=None, now=None):
+        timestamp = self.timestamps.get(prop_str)
+        if timestamp is None:
+            return default
+        if now is None:
+            now = time.monotonic()
+        if now - timestamp > self.ttl_factor / self.rates[prop_str]:
+            return default
+        return self.values[prop_str]
+
+    def timestamp(self, prop_str):
+        return self.timestamps.get(prop_str)
+
+    def fresh_values(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        return {prop_str: self.values[prop_str] for prop_str in self.values
+                if self.get(prop_str, now=now) is not None}
@@ -0,0 +1,114 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import deque
+
+from telemetry import GUI_FIELDS
+
+RECORD_FIELDS = ("time",) + GUI_FIELDS + ("airspeed",)
+RECORD_STRUCT = struct.Struct("<" + "d" * len(RECORD_FIELDS))
+HEADER_STRUCT = struct.Struct("<8sIIQ")
+HEADER_SIZE = 64
+MAGIC = b"BPLAREC1"
+VERSION = 1
+
+
+def record_dtype():
+    import numpy as np
+    return np.dtype([(name, "<f8") for name in RECORD_FIELDS])
+
+
+class FlightRecorder:
+    def __init__(self, path, chunk_records=65536, flush_interval=0.25):
+        self.path = path
+        self.chunk_records = chunk_records
+        self.flush_interval = flush_interval
+        self.pending = deque()
+        self.count = 0
+        self.capacity = 0
+        self.file = open(path, "w+b")
+        self.map = None
+        self.grow()
+        self.write_header()
+        self.wakeup = threading.Event()
+        self.running = True
+        self.thread = threading.Thread(target=self.writer, name="flight-recorder", daemon=True)
+        self.thread.start()
+
+    def grow(self):
+        # Preallocate a whole chunk at a time so the writer only remaps once per chunk.
+        if self.map is not None:
+            self.map.flush()
+            self.map.close()
+        self.capacity += self.chunk_records
+        self.file.truncate(HEADER_SIZE + self.capacity * RECORD_STRUCT.size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+    def write_header(self):
+        HEADER_STRUCT.pack_into(self.map, 0, MAGIC, VERSION, RECORD_STRUCT.size, self.count)
+
+    def record(self, snapshot, timestamp=None):
+        # Called from the render loop: only a deque append, the writer thread does the rest.
+        if timestamp is None:
+            timestamp = time.time()
+        self.pending.append((timestamp,) + tuple(snapshot[:len(GUI_FIELDS)]) + (snapshot.airspeed,))
+
+    def write_pending(self):
+        pending = self.pending
+        written = 0
+        while pending:
+            values = pending.popleft()
+            if self.count == self.capacity:
+                self.grow()
+            RECORD_STRUCT.pack_into(self.map, HEADER_SIZE + self.count * RECORD_STRUCT.size, *values)
+            self.count += 1
+            written += 1
+        if written:
+            self.write_header()
+        return written
+
+    def writer(self):
+        while self.running:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.write_pending()
+
+    def close(self):
+        self.running = False
+        self.wakeup.set()
+        self.thread.join()
+        self.write_pending()
+        self.map.flush()
+        self.map.close()
+        self.file.truncate(HEADER_SIZE + self.count * RECORD_STRUCT.size)
+        self.file.close()
+
+
+class FlightLog:
+    def __init__(self, path):
+        import numpy as np
+
+        with open(path, "rb") as f:
+            magic, version, record_size, count = HEADER_STRUCT.unpack(f.read(HEADER_STRUCT.size))
+        if magic != MAGIC or version != VERSION or record_size != RECORD_STRUCT.size:
+            raise ValueError(f"{path} is not a flight recording")
+        # A recorder that is still running may not have written every record it counted yet.
+        available = (os.path.getsize(path) - HEADER_SIZE) // record_size
+        self.count = min(count, available)
+        self.path = path
+        if self.count:
+            self.records = np.memmap(path, dtype=record_dtype(), mode="r", offset=HEADER_SIZE,
+                                     shape=(self.count,))
+        else:
+            self.records = np.zeros(0, dtype=record_dtype())
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, field):
+        return self.records[field]
+
+    def columns(self):
+        return {name: self.records[name] for name in RECORD_FIELDS}
@@ -0,0 +1,97 @@
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+from recorder import FlightLog, RECORD_FIELDS
+from telemetry import EMPTY_SNAPSHOT, GUI_FIELDS
+
+MIN_SPEED = 0.25
+MAX_SPEED = 16.0
+
+
+class ReplaySource:
+    def __init__(self, path, speed=1.0, index_stride=1024, loop=False):
+        self.log = FlightLog(path)
+        if not len(self.log):
+            raise ValueError(f"{path} has no recorded samples")
+        self.times = self.log["time"]
+        self.index_stride = index_stride
+        # Every index_stride-th timestamp kept in memory; a seek bisects it and then
+        # searches a single block of the mapped file.
+        self.index_times = np.array(self.times[::index_stride])
+        self.start_time = float(self.times[0])
+        self.end_time = float(self.times[-1])
+        self.loop = loop
+        self.speed = min(MAX_SPEED, max(MIN_SPEED, speed))
+        self.paused = False
+        self.position = self.start_time
+        self.anchor_wall = time.monotonic()
+        self.anchor_position = self.start_time
+
+    def start(self):
+        self.anchor_wall = time.monotonic()
+        self.anchor_position = self.position
+
+    def stop(self):
+        pass
+
+    def index_at(self, timestamp):
+        block = max(0, bisect_right(self.index_times, timestamp) - 1)
+        first = block * self.index_stride
+        last = min(len(self.times), first + self.index_stride + 1)
+        offset = int(np.searchsorted(self.times[first:last], timestamp, side="right")) - 1
+        return max(0, first + offset)
+
+    def current_position(self):
+        if self.paused:
+            return self.position
+        position = self.anchor_position + (time.monotonic() - self.anchor_wall) * self.speed
+        if position > self.end_time:
+            if self.loop:
+                position = self.start_time + (position - self.start_time) % (self.end_time - self.start_time or 1.0)
+            else:
+                position = self.end_time
+        return position
+
+    def seek(self, timestamp):
+        self.position = min(self.end_time, max(self.start_time, timestamp))
+        self.anchor_position = self.position
+        self.anchor_wall = time.monotonic()
+
+    def set_speed(self, speed):
+        self.seek(self.current_position())
+        self.speed = min(MAX_SPEED, max(MIN_SPEED, speed))
+
+    def toggle_pause(self):
+        self.seek(self.current_position())
+        self.paused = not self.paused
+
+    def step(self, frames=1):
+        self.paused = True
+        index = self.index_at(self.current_position()) + frames
+        index = min(len(self.times) - 1, max(0, index))
+        self.seek(float(self.times[index]))
+
+    @property
+    def finished(self):
+        return not self.loop and self.current_position() >= self.end_time
+
+    def latest(self):
+        self.position = self.current_position()
+        return self.snapshot_at(self.position)
+
+    def snapshot_at(self, timestamp):
+        record = self.log.records[self.index_at(timestamp)]
+        fields = {name: float(record[name]) for name in GUI_FIELDS}
+        sample_time = float(record["time"])
+        return EMPTY_SNAPSHOT._replace(airspeed=float(record["airspeed"]), gui_time=sample_time,
+                                       airspeed_time=sample_time, **fields)
+
+    def parent_recv(self):
+        return tuple(self.latest()[:len(GUI_FIELDS)])
+
+    def get_prop(self, prop_str):
+        if prop_str == '/velocities/airspeed-kt':
+            return self.latest().airspeed
+        raise KeyError(f"{prop_str} is not part of the recording, only {RECORD_FIELDS} are")
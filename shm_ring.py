@@ -0,0 +1,222 @@
+import argparse
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from profiler import percentile
+from telemetry import GUI_FIELDS
+
+HEADER_SIZE = 8
+
+
+class ShmRing:
+    # Fixed-size records of float64 in a shared memory block, for one writer process and any number
+    # of readers, without locks. A record is [seq, time, values...]; seq is odd while the writer is
+    # filling it and 2 * (record number + 1) once it is complete. The header's "written" count is
+    # bumped only after the record is complete, so everything below it can be read in place.
+    def __init__(self, capacity=1024, fields=GUI_FIELDS, name=None):
+        create = name is None
+        width = 2 + len(fields)
+        if create:
+            self.shm = shared_memory.SharedMemory(create=True, size=(HEADER_SIZE + capacity * width) * 8)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.header = np.ndarray((HEADER_SIZE,), dtype=np.float64, buffer=self.shm.buf)
+        if create:
+            self.header[:] = 0.0
+            self.header[1] = capacity
+            self.header[2] = width
+        self.capacity = int(self.header[1])
+        self.width = int(self.header[2])
+        self.fields = fields
+        self.records = np.ndarray((self.capacity, self.width), dtype=np.float64, buffer=self.shm.buf,
+                                  offset=HEADER_SIZE * 8)
+        self.written = int(self.header[0])
+        self.overruns = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, timestamp, values):
+        # Only ever called from the one writer process, which keeps its own count.
+        n = self.written
+        row = self.records[n % self.capacity]
+        row[0] = 2 * n + 1
+        row[1] = timestamp
+        row[2:] = values
+        row[0] = 2 * n + 2
+        self.written = n + 1
+        self.header[0] = n + 1
+
+    def count(self):
+        return int(self.header[0])
+
+    def latest(self):
+        # The newest complete record as a view into shared memory, or None before the first write.
+        n = self.count()
+        if not n:
+            return None
+        return self.records[(n - 1) % self.capacity]
+
+    def latest_values(self):
+        # Copies the newest record out, retrying if the writer laps it mid-read.
+        while True:
+            n = self.count()
+            if not n:
+                return None
+            row = self.records[(n - 1) % self.capacity]
+            values = row.tolist()
+            if values[0] == 2 * n and row[0] == values[0]:
+                return values[1:]
+
+    def read_since(self, cursor, slack=None):
+        # Returns (views, cursor): at most two slices of the ring, in order, covering the records
+        # written since cursor. Records the writer already overwrote are skipped and counted, and
+        # slack records are left as headroom the writer can fill while the views are being read.
+        slack = self.capacity // 4 if slack is None else slack
+        n = self.count()
+        oldest = n - (self.capacity - slack)
+        if cursor < oldest:
+            self.overruns += oldest - cursor
+            cursor = oldest
+        if cursor >= n:
+            return (), n
+        first = cursor % self.capacity
+        last = n % self.capacity
+        if first < last:
+            return (self.records[first:last],), n
+        return (self.records[first:], self.records[:last]) if last else (self.records[first:],), n
+
+    def still_valid(self, cursor):
+        # True while records from cursor on have not been overwritten since read_since returned them.
+        return self.count() - cursor <= self.capacity
+
+    def close(self, unlink=False):
+        del self.records
+        del self.header
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+attached_rings = {}
+
+
+def attached_ring(name):
+    # For the writer process: attach once, on the first sample.
+    ring = attached_rings.get(name)
+    if ring is None:
+        ring = attached_rings[name] = ShmRing(name=name)
+    return ring
+
+
+SAMPLE_VALUES = (55.75, 37.6, 300.0, 120.0, 1.5, -0.5, 90.0, 2.0)
+
+
+def paced(samples, rate):
+    interval = 1.0 / rate if rate else 0.0
+    started = time.monotonic()
+    for i in range(samples):
+        yield i
+        if interval:
+            time.sleep(max(0.0, started + (i + 1) * interval - time.monotonic()))
+
+
+def pipe_writer(conn, samples, rate, write_seconds):
+    spent = 0.0
+    for _ in paced(samples, rate):
+        t0 = time.perf_counter()
+        conn.send((time.monotonic(),) + SAMPLE_VALUES)
+        spent += time.perf_counter() - t0
+    conn.send(None)
+    write_seconds.value = spent
+
+
+def ring_writer(name, samples, rate, write_seconds):
+    ring = ShmRing(name=name)
+    spent = 0.0
+    for _ in paced(samples, rate):
+        t0 = time.perf_counter()
+        ring.write(time.monotonic(), SAMPLE_VALUES)
+        spent += time.perf_counter() - t0
+    ring.close()
+    write_seconds.value = spent
+
+
+def bench_pipe(samples, rate, frame_interval):
+    # The reader behaves like the render loop: once per frame it takes everything queued and keeps
+    # the newest sample, and latency is the age of that sample.
+    parent, child = mp.Pipe(duplex=False)
+    write_seconds = mp.Value("d", 0.0)
+    writer = mp.Process(target=pipe_writer, args=(child, samples, rate, write_seconds))
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    writer.start()
+    received = 0
+    ages = []
+    done = False
+    while not done:
+        newest = None
+        while parent.poll():
+            item = parent.recv()
+            if item is None:
+                done = True
+                break
+            received += 1
+            newest = item
+        if newest is not None:
+            ages.append(time.monotonic() - newest[0])
+        if frame_interval:
+            time.sleep(frame_interval)
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    writer.join()
+    return received, 0, elapsed, cpu, write_seconds.value, ages
+
+
+def bench_ring(samples, rate, frame_interval, capacity):
+    ring = ShmRing(capacity)
+    write_seconds = mp.Value("d", 0.0)
+    writer = mp.Process(target=ring_writer, args=(ring.name, samples, rate, write_seconds))
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    writer.start()
+    cursor = 0
+    received = 0
+    ages = []
+    while cursor < samples and (writer.is_alive() or cursor < ring.count()):
+        views, end = ring.read_since(cursor)
+        if views:
+            for view in views:
+                received += len(view)
+            ages.append(time.monotonic() - views[-1][-1, 1])
+        cursor = end
+        if frame_interval:
+            time.sleep(frame_interval)
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    writer.join()
+    overruns = ring.overruns
+    ring.close(unlink=True)
+    return received, overruns, elapsed, cpu, write_seconds.value, ages
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Shared-memory ring against the multiprocessing pipe for GUI samples")
+    parser.add_argument("--samples", type=int, default=200000)
+    parser.add_argument("--rate", type=float, default=0.0, help="samples per second from the writer, 0 for flat out")
+    parser.add_argument("--frame", type=float, default=0.0, help="seconds the reader sleeps between reads")
+    parser.add_argument("--capacity", type=int, default=4096)
+    args = parser.parse_args()
+
+    for name, result in (("pipe", bench_pipe(args.samples, args.rate, args.frame)),
+                         ("ring", bench_ring(args.samples, args.rate, args.frame, args.capacity))):
+        received, overruns, elapsed, cpu, write_seconds, ages = result
+        ages.sort()
+        print(f"{name}: {received} received, {overruns} overrun in {elapsed:.2f} s "
+              f"({received / elapsed:.0f} samples/s), writer {write_seconds / args.samples * 1e6:.2f} us/sample, "
+              f"reader cpu {cpu:.2f} s, newest sample age p50 {percentile(ages, 0.5) * 1e6:.0f} us "
+              f"p99 {percentile(ages, 0.99) * 1e6:.0f} us")
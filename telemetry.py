@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import namedtuple
+
+GUI_FIELDS = ("lat_deg", "lon_deg", "alt_m", "agl_m", "phi_rad", "theta_rad", "psi_rad", "climb_rate")
+
+TelemetrySnapshot = namedtuple("TelemetrySnapshot", GUI_FIELDS + ("airspeed", "gui_time", "airspeed_time", "props"))
+
+EMPTY_SNAPSHOT = TelemetrySnapshot(*([0.0] * len(GUI_FIELDS)), airspeed=0.0, gui_time=None, airspeed_time=None,
+                                   props={})
+
+
+class TelemetryFeed:
+    def __init__(self, gui_event_pipe, poller, airspeed_prop='/velocities/airspeed-kt',
+                 max_telnet_sleep=0.1, gui_ring=None):
+        self.gui_event_pipe = gui_event_pipe
+        self.gui_ring = gui_ring
+        self.gui_ring_count = 0
+        self.poller = poller
+        self.airspeed_prop = airspeed_prop
+        self.max_telnet_sleep = max_telnet_sleep
+        self.snapshot = EMPTY_SNAPSHOT
+        self.write_lock = threading.Lock()
+        self.running = False
+        self.threads = []
+        self.gui_samples = 0
+        self.gui_dropped = 0
+        self.telnet_errors = 0
+
+    def start(self):
+        self.running = True
+        self.threads = [threading.Thread(target=self.telnet_worker, name="telnet-telemetry", daemon=True)]
+        # With a shared-memory ring the render loop reads GUI samples itself, see latest().
+        if self.gui_ring is None:
+            self.threads.append(threading.Thread(target=self.gui_worker, name="gui-telemetry", daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.running = False
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+
+    def latest(self):
+        # Writers swap in a whole new tuple, so readers never see a half-updated sample.
+        if self.gui_ring is not None:
+            self.read_gui_ring()
+        return self.snapshot
+
+    def read_gui_ring(self):
+        ring = self.gui_ring
+        overruns = ring.overruns
+        # Only the newest record is shown, but every record written counts as a received sample;
+        # dropped are the ones the ring overwrote before this reader got to them.
+        _, count = ring.read_since(self.gui_ring_count, slack=0)
+        if count == self.gui_ring_count:
+            return
+        values = ring.latest_values()
+        self.gui_samples += count - self.gui_ring_count
+        self.gui_dropped += ring.overruns - overruns
+        self.gui_ring_count = count
+        # Stamped by the receiving process when the packet arrived, on the same monotonic clock.
+        self.publish(gui_time=values[0], **dict(zip(GUI_FIELDS, values[1:])))
+
+    def publish(self, **fields):
+        with self.write_lock:
+            self.snapshot = self.snapshot._replace(**fields)
+
+    def gui_worker(self):
+        pipe = self.gui_event_pipe
+        while self.running:
+            if not pipe.parent_poll(0.1):
+                continue
+            pipe_data = pipe.parent_recv()
+            # Only the newest packet matters for display, skip anything queued behind it.
+            while pipe.parent_poll():
+                pipe_data = pipe.parent_recv()
+                self.gui_dropped += 1
+            self.gui_samples += 1
+            self.publish(gui_time=time.monotonic(), **dict(zip(GUI_FIELDS, pipe_data)))
+
+    def telnet_worker(self):
+        poller = self.poller
+        while self.running:
+            try:
+                poller.poll()
+                sleep = min(poller.time_to_next(), self.max_telnet_sleep)
+            except Exception:
+                self.telnet_errors += 1
+                sleep = self.max_telnet_sleep
+            # Republished on every pass, failed polls included, so expired properties drop out of
+            # the snapshot; airspeed_time keeps the last good fetch and the ОДТ alarm ages it.
+            self.publish(airspeed=poller.get(self.airspeed_prop, self.snapshot.airspeed),
+                         airspeed_time=poller.timestamp(self.airspeed_prop),
+                         props=poller.fresh_values())
+            time.sleep(sleep)
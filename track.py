@@ -0,0 +1,90 @@
+import math
+from array import array
+
+METERS_PER_DEGREE = 6371000.0 * math.pi / 180
+
+
+def segment_deviations_exceed(lats, lons, lat1, lon1, lat2, lon2, tolerance_m):
+    # Local equirectangular projection around the segment start, good enough for the few
+    # hundred meters a single simplification window spans.
+    scale_x = METERS_PER_DEGREE * math.cos(math.radians(lat1))
+    dx = (lon2 - lon1) * scale_x
+    dy = (lat2 - lat1) * METERS_PER_DEGREE
+    length_sq = dx * dx + dy * dy
+    tolerance_sq = tolerance_m * tolerance_m
+    for lat, lon in zip(lats, lons):
+        px = (lon - lon1) * scale_x
+        py = (lat - lat1) * METERS_PER_DEGREE
+        if length_sq == 0.0:
+            t = 0.0
+        else:
+            t = max(0.0, min(1.0, (px * dx + py * dy) / length_sq))
+        ex = px - t * dx
+        ey = py - t * dy
+        if ex * ex + ey * ey > tolerance_sq:
+            return True
+    return False
+
+
+class TrackStore:
+    def __init__(self, tolerance_m=5.0, max_points=2000, max_window=64):
+        self.tolerance_m = tolerance_m
+        self.max_points = max_points
+        self.max_window = max_window
+        self.lat = array('d')
+        self.lon = array('d')
+        self.window_lat = array('d')
+        self.window_lon = array('d')
+        self.samples = 0
+
+    def __len__(self):
+        return len(self.lat) + (1 if self.window_lat else 0)
+
+    def append(self, lat_deg, lon_deg):
+        self.samples += 1
+        if not self.lat:
+            self.keep(lat_deg, lon_deg)
+            return
+
+        # Opening-window simplification: the points seen since the last kept one must all
+        # stay within tolerance of the segment from that kept point to the new sample.
+        if segment_deviations_exceed(self.window_lat, self.window_lon, self.lat[-1], self.lon[-1],
+                                     lat_deg, lon_deg, self.tolerance_m):
+            self.keep(self.window_lat[-1], self.window_lon[-1])
+
+        self.window_lat.append(lat_deg)
+        self.window_lon.append(lon_deg)
+        if len(self.window_lat) >= self.max_window:
+            self.keep(lat_deg, lon_deg)
+
+    def keep(self, lat_deg, lon_deg):
+        self.lat.append(lat_deg)
+        self.lon.append(lon_deg)
+        del self.window_lat[:]
+        del self.window_lon[:]
+        if len(self.lat) > self.max_points:
+            self.thin()
+
+    def thin(self):
+        # Halve the retained points, so the track keeps its full extent at a coarser
+        # resolution instead of forgetting the start of the flight.
+        last_lat = self.lat[-1]
+        last_lon = self.lon[-1]
+        self.lat = self.lat[::2]
+        self.lon = self.lon[::2]
+        if self.lat[-1] != last_lat or self.lon[-1] != last_lon:
+            self.lat.append(last_lat)
+            self.lon.append(last_lon)
+
+    def points(self):
+        points = [[lat, lon] for lat, lon in zip(self.lat, self.lon)]
+        if self.window_lat:
+            points.append([self.window_lat[-1], self.window_lon[-1]])
+        return points
+
+    def last_point(self):
+        if self.window_lat:
+            return self.window_lat[-1], self.window_lon[-1]
+        if self.lat:
+            return self.lat[-1], self.lon[-1]
+        return None